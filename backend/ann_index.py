@@ -0,0 +1,171 @@
+"""
+Approximate nearest-neighbor index (IVF-flat, pure NumPy) untuk SBERT embeddings.
+
+Build : spherical k-means atas embeddings (unit vectors) -> n_lists centroid,
+        setiap dokumen masuk ke inverted list centroid terdekatnya.
+Search: ambil n_probe centroid terdekat dari query, lalu skor exact
+        (dot product) hanya untuk dokumen di list-list tersebut.
+
+n_probe adalah knob recall/latency: n_probe = n_lists sama dengan brute force.
+Dengan category mask, n_probe diskalakan dengan selektivitas mask (atau
+langsung exact atas dokumen yang diizinkan untuk kategori kecil).
+Disimpan oleh train_sbert sebagai embeddings/{kategori}_ivf.*.npy.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from array_store import arrays_exist, load_arrays, save_arrays
+from scoring import l2_normalize_rows, top_k_indices
+
+ANN_MIN_DOCS = 5000        # Di bawah ini brute force lebih cepat / cukup cepat
+DEFAULT_N_PROBE = 8
+KMEANS_TRAIN_SAMPLE = 50000
+_ASSIGN_CHUNK = 8192
+
+def default_n_lists(n_docs):
+    return max(1, int(round(2 * np.sqrt(n_docs))))
+
+# ============================================================
+# SPHERICAL K-MEANS
+# ============================================================
+def _assign(vectors, centroids):
+    """Nearest centroid (max dot product) for every row, in chunks"""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        chunk = vectors[start:start + _ASSIGN_CHUNK]
+        assign[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assign
+
+def spherical_kmeans(vectors, n_clusters, n_iter=15, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assign = _assign(vectors, centroids)
+        one_hot = csr_matrix(
+            (np.ones(len(vectors), dtype=np.float32), (assign, np.arange(len(vectors)))),
+            shape=(n_clusters, len(vectors))
+        )
+        sums = np.asarray(one_hot @ vectors)
+
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(np.bincount(assign, minlength=n_clusters) == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+        centroids = l2_normalize_rows(sums)
+
+    return centroids
+
+# ============================================================
+# IVF-FLAT INDEX
+# ============================================================
+class IVFFlatIndex:
+    """
+    Inverted lists over unit-length embeddings.
+    Documents of list c are list_ids[list_ptr[c]:list_ptr[c+1]].
+    Vectors themselves are not duplicated: search scores rows of the
+    embedding matrix the index was built from.
+    """
+
+    ARRAYS = ("centroids", "list_ptr", "list_ids")
+
+    def __init__(self, centroids, list_ptr, list_ids):
+        self.centroids = centroids
+        self.list_ptr = list_ptr
+        self.list_ids = list_ids
+        self.n_lists = len(centroids)
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, n_iter=15, seed=0, train_sample=KMEANS_TRAIN_SAMPLE):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n_docs = len(embeddings)
+        n_lists = min(n_docs, n_lists or default_n_lists(n_docs))
+
+        rng = np.random.default_rng(seed)
+        if n_docs > train_sample:
+            sample = embeddings[np.sort(rng.choice(n_docs, train_sample, replace=False))]
+        else:
+            sample = embeddings
+        centroids = spherical_kmeans(sample, n_lists, n_iter=n_iter, seed=seed)
+
+        assign = _assign(embeddings, centroids)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        list_ptr = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+
+        return cls(centroids, list_ptr, list_ids)
+
+    def save(self, prefix):
+        save_arrays(prefix, centroids=self.centroids, list_ptr=self.list_ptr, list_ids=self.list_ids)
+
+    @classmethod
+    def exists(cls, prefix):
+        return arrays_exist(prefix, cls.ARRAYS)
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        data = load_arrays(prefix, cls.ARRAYS, mmap=mmap)
+        return cls(data["centroids"], data["list_ptr"], data["list_ids"])
+
+    def candidates(self, query, n_probe=DEFAULT_N_PROBE):
+        """Document ids in the n_probe lists closest to a unit query vector"""
+        probe = top_k_indices(self.centroids @ query, min(n_probe, self.n_lists))
+        return np.concatenate([self.list_ids[self.list_ptr[c]:self.list_ptr[c + 1]] for c in probe])
+
+    def search(self, query, embeddings, top_k, n_probe=DEFAULT_N_PROBE, min_score=None, mask=None):
+        """
+        (ids, scores) of the approximate top_k, best first; mask: allowed documents.
+        With a mask only a fraction f of each probed list is usable, so n_probe
+        is scaled by 1/f to scan about as many allowed documents as unmasked.
+        When that would cost more than scoring the allowed documents directly
+        (f^2 * n_lists <= n_probe), or the probed lists still hold fewer than
+        top_k allowed documents, the allowed documents are scored exactly.
+        """
+        if mask is None:
+            ids = self.candidates(query, n_probe)
+        else:
+            fraction = np.count_nonzero(mask) / max(len(mask), 1)
+            if fraction * fraction * self.n_lists <= n_probe:
+                ids = np.flatnonzero(mask)
+            else:
+                ids = self.candidates(query, int(np.ceil(n_probe / fraction)))
+                ids = ids[mask[ids]]
+                if len(ids) < top_k:
+                    ids = np.flatnonzero(mask)
+        scores = embeddings[ids] @ query
+        order = top_k_indices(scores, top_k, min_score=min_score)
+        return ids[order], scores[order]
+
+# ============================================================
+# RECALL REPORT
+# ============================================================
+def recall_report(index, embeddings, k=10, n_queries=200, n_probes=(1, 2, 4, 8, 16, 32), noise=0.05, seed=0):
+    """
+    recall@k of the ANN index against brute force.
+    Queries are corpus vectors with a little gaussian noise, so they look like
+    real queries that land near (but not exactly on) documents.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[picks] + rng.normal(0, noise, size=(len(picks), embeddings.shape[1])).astype(np.float32)
+    queries = l2_normalize_rows(queries)
+
+    exact = [set(top_k_indices(embeddings @ q, k).tolist()) for q in queries]
+
+    report = {}
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            break
+        hits = 0
+        scanned = 0
+        for q, truth in zip(queries, exact):
+            ids, _ = index.search(q, embeddings, k, n_probe=n_probe)
+            hits += len(truth & set(ids.tolist()))
+            scanned += len(index.candidates(q, n_probe))
+        report[n_probe] = {
+            "recall_at_k": hits / (k * len(queries)),
+            "scanned_fraction": scanned / (len(queries) * len(embeddings)),
+        }
+    return report
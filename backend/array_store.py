@@ -0,0 +1,52 @@
+"""
+Raw array artifacts untuk index TasteFind.
+
+Setiap array disimpan sebagai file .npy sendiri ({prefix}.{name}.npy,
+header numpy ter-align) sehingga query_engine bisa membukanya dengan
+mmap_mode='r': cold start hanya mmap, tanpa decompress-and-copy, dan
+semua worker process berbagi page cache OS yang sama.
+"""
+
+import os
+
+import numpy as np
+
+def array_path(prefix, name):
+    return f"{prefix}.{name}.npy"
+
+def save_arrays(prefix, **arrays):
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        # ascontiguousarray would turn 0-d scalars (n_docs, mode) into shape (1,)
+        np.save(array_path(prefix, name), array if array.ndim == 0 else np.ascontiguousarray(array), allow_pickle=False)
+
+def arrays_exist(prefix, names):
+    return all(os.path.exists(array_path(prefix, name)) for name in names)
+
+def load_arrays(prefix, names, mmap=True):
+    """dict name -> array; memory-mapped read-only unless mmap=False"""
+    mode = "r" if mmap else None
+    return {name: np.load(array_path(prefix, name), mmap_mode=mode, allow_pickle=False) for name in names}
+
+# ============================================================
+# CSR MATRICES
+# ============================================================
+CSR_ARRAYS = ("data", "indices", "indptr", "shape")
+
+def save_csr(prefix, matrix):
+    matrix = matrix.tocsr()
+    save_arrays(
+        prefix,
+        data=matrix.data,
+        indices=matrix.indices,
+        indptr=matrix.indptr,
+        shape=np.array(matrix.shape, dtype=np.int64),
+    )
+
+def load_csr(prefix, mmap=True):
+    """CSR matrix whose data/indices/indptr are views on the memory-mapped files"""
+    from scipy.sparse import csr_matrix
+
+    arrays = load_arrays(prefix, CSR_ARRAYS, mmap=mmap)
+    shape = tuple(int(x) for x in arrays["shape"])
+    return csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
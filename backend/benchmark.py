@@ -0,0 +1,262 @@
+"""
+Latency benchmark untuk search hot path TasteFind.
+
+Target yang diukur (dengan query mix berbahasa Indonesia yang sama):
+  search_tfidf : branch TF-IDF saja
+  search_sbert : branch SBERT saja
+  search       : query_engine.search (kedua branch + fusion + result cache)
+  http_search  : POST /search lewat Flask test client (routing + JSON)
+
+Untuk setiap target:
+  cold       : cache (embedding + result) dikosongkan sebelum setiap query
+  warm       : query mix diulang dengan cache terisi
+  allocations: tracemalloc peak / retained bytes per query (cache kosong)
+  throughput : query/detik dengan N client concurrent (thread), cache terisi
+
+Hasil ditulis sebagai JSON (benchmarks/bench_<timestamp>.json) supaya
+run sebelum/sesudah perubahan bisa dibandingkan.
+
+Run     :  python benchmark.py [--repeat 5] [--clients 1,4,8] [--targets search,http_search]
+Compare :  python benchmark.py --compare benchmarks/old.json benchmarks/new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import query_engine
+from caching import EMBEDDING_CACHE, RESULT_CACHE
+from query_engine import get_index, get_sbert_model, scoring_config, search, search_sbert, search_tfidf
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(BASE_DIR, "benchmarks")
+PERCENTILES = (50, 95, 99)
+
+# (query, category): short head queries, multi-word recipes, typos-free long tail
+QUERY_MIX = [
+    ("ayam goreng", "semua"),
+    ("resep soto ayam", "makanan"),
+    ("nasi goreng kampung pedas", "makanan"),
+    ("rendang daging sapi", "makanan"),
+    ("ikan bakar", "semua"),
+    ("sayur bening bayam", "sehat"),
+    ("makanan sehat untuk diet", "sehat"),
+    ("jus segar", "minuman"),
+    ("kopi susu gula aren", "minuman"),
+    ("es jeruk", "minuman"),
+    ("minuman hangat musim hujan", "minuman"),
+    ("kue coklat tanpa oven", "makanan"),
+    ("takjil buka puasa", "semua"),
+    ("berita kuliner terbaru", "berita"),
+    ("harga cabai naik", "berita"),
+    ("sambal", "semua"),
+]
+
+# ============================================================
+# TARGETS
+# ============================================================
+def make_targets(names):
+    """name -> fn(query, category); app (and Flask) is only imported if http_search is asked for"""
+    targets = {
+        "search_tfidf": lambda q, c: search_tfidf(q, c, top_k=20),
+        "search_sbert": lambda q, c: search_sbert(q, c, top_k=20),
+        "search": lambda q, c: search(q, c, top_k=10),
+    }
+    if "http_search" in names:
+        from app import app
+        client = app.test_client()
+
+        def http_search(q, c):
+            response = client.post("/search", json={"query": q, "category": c, "top_k": 10})
+            if response.status_code != 200:
+                raise RuntimeError(f"/search returned {response.status_code}")
+            return response.get_data()
+
+        targets["http_search"] = http_search
+
+    unknown = set(names) - set(targets)
+    if unknown:
+        raise ValueError(f"Unknown benchmark targets: {sorted(unknown)}")
+    return {name: targets[name] for name in names}
+
+def clear_caches():
+    EMBEDDING_CACHE.clear()
+    RESULT_CACHE.clear()
+
+# ============================================================
+# MEASUREMENTS
+# ============================================================
+def latency_stats(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    stats = {"n": int(len(samples))}
+    if len(samples) == 0:
+        return stats
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = float(np.percentile(samples, p))
+    stats.update({"mean_ms": float(samples.mean()), "max_ms": float(samples.max())})
+    return stats
+
+def measure_latency(fn, queries, repeat, cold):
+    samples = []
+    for _ in range(repeat):
+        for query, category in queries:
+            if cold:
+                clear_caches()
+            start = time.perf_counter()
+            fn(query, category)
+            samples.append((time.perf_counter() - start) * 1000)
+    return latency_stats(samples)
+
+def measure_allocations(fn, queries):
+    """tracemalloc peak (transient) and retained bytes per query, caches cleared each time"""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for query, category in queries:
+            clear_caches()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(query, category)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kb_mean": float(np.mean(peaks) / 1024),
+        "peak_kb_max": float(np.max(peaks) / 1024),
+        "retained_kb_mean": float(np.mean(retained) / 1024),
+    }
+
+def measure_throughput(fn, queries, clients, requests_per_client):
+    """Queries/second with `clients` threads each sending requests_per_client queries"""
+    def client(offset):
+        samples = []
+        for i in range(requests_per_client):
+            query, category = queries[(offset + i) % len(queries)]
+            start = time.perf_counter()
+            fn(query, category)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - started
+
+    samples = [s for result in results for s in result]
+    return {"clients": clients, "qps": len(samples) / elapsed, "elapsed_s": elapsed, **latency_stats(samples)}
+
+def measure_startup():
+    """First-use cost in this process: index load + SBERT model load"""
+    started = time.perf_counter()
+    get_index()
+    index_s = time.perf_counter() - started
+    started = time.perf_counter()
+    get_sbert_model()
+    return {"index_load_s": index_s, "sbert_load_s": time.perf_counter() - started}
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scoring_config": scoring_config(),
+        "sbert_backend": query_engine.SBERT_BACKEND,
+    }
+
+def run_benchmark(targets, queries=QUERY_MIX, repeat=5, clients=(1, 4, 8), requests_per_client=50):
+    report = {"environment": environment(), "startup": measure_startup(), "targets": {}}
+    report["environment"].update({"queries": len(queries), "repeat": repeat, "requests_per_client": requests_per_client})
+
+    for name, fn in make_targets(targets).items():
+        print(f"[INFO] Benchmarking {name}...", file=sys.stderr)
+        result = {
+            "cold": measure_latency(fn, queries, repeat, cold=True),
+            "allocations": measure_allocations(fn, queries),
+        }
+        # One pass to fill the caches, then warm timings + throughput
+        clear_caches()
+        measure_latency(fn, queries, 1, cold=False)
+        result["warm"] = measure_latency(fn, queries, repeat, cold=False)
+        result["throughput"] = [measure_throughput(fn, queries, n, requests_per_client) for n in clients]
+        report["targets"][name] = result
+    return report
+
+# ============================================================
+# COMPARE TWO RUNS
+# ============================================================
+def compare(old, new):
+    """Lines of 'target phase metric old -> new (change)' for the latency percentiles and qps"""
+    lines = []
+    for name, result in new["targets"].items():
+        previous = old["targets"].get(name)
+        if previous is None:
+            continue
+        for phase in ("cold", "warm"):
+            for p in PERCENTILES:
+                key = f"p{p}_ms"
+                a, b = previous[phase].get(key), result[phase].get(key)
+                if a and b is not None:
+                    lines.append(f"{name:<13} {phase:<5} {key:<7} {a:9.3f} -> {b:9.3f} ({(b - a) / a:+.1%})")
+        before = {t["clients"]: t["qps"] for t in previous.get("throughput", [])}
+        for run in result.get("throughput", []):
+            a = before.get(run["clients"])
+            if a:
+                lines.append(f"{name:<13} qps@{run['clients']:<3} {a:17.1f} -> {run['qps']:9.1f} ({(run['qps'] - a) / a:+.1%})")
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TasteFind search latency benchmark")
+    parser.add_argument("--targets", default="search_tfidf,search_sbert,search,http_search")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--clients", default="1,4,8")
+    parser.add_argument("--requests-per-client", type=int, default=50)
+    parser.add_argument("--output", help="JSON path (default: benchmarks/bench_<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two benchmark JSON files")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        print("\n".join(compare(*reports)))
+        sys.exit(0)
+
+    report = run_benchmark(
+        targets=[t.strip() for t in args.targets.split(",") if t.strip()],
+        repeat=args.repeat,
+        clients=[int(n) for n in args.clients.split(",")],
+        requests_per_client=args.requests_per_client,
+    )
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["targets"].items():
+        cold, warm = result["cold"], result["warm"]
+        qps = ", ".join(f"{t['clients']}c={t['qps']:.0f}/s" for t in result["throughput"])
+        print(f"{name:<13} cold p50 {cold['p50_ms']:8.2f} p95 {cold['p95_ms']:8.2f} p99 {cold['p99_ms']:8.2f} ms | "
+              f"warm p50 {warm['p50_ms']:7.3f} p99 {warm['p99_ms']:7.3f} ms | "
+              f"peak {result['allocations']['peak_kb_mean']:.0f} KB | {qps}")
+    print(f"✓ Saved {output}")
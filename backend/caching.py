@@ -0,0 +1,205 @@
+"""
+In-process caches untuk TasteFind.
+
+EMBEDDING_CACHE dipakai bersama oleh query_engine dan evaluate supaya
+query yang sama ("ayam goreng", "soto ayam", ...) tidak melewati
+forward pass transformer berulang kali.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+EMBEDDING_CACHE_SIZE = int(os.environ.get("TASTEFIND_EMBEDDING_CACHE_SIZE", "2048"))
+RESULT_CACHE_ENABLED = os.environ.get("TASTEFIND_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_SIZE = int(os.environ.get("TASTEFIND_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.environ.get("TASTEFIND_RESULT_CACHE_TTL", "600"))
+
+# ============================================================
+# QUERY NORMALIZATION
+# ============================================================
+def normalize_query(text):
+    """Lowercase + collapse whitespace, dipakai sebagai cache key"""
+    if not text:
+        return ""
+    return re.sub(r"\s+", " ", str(text).lower().strip())
+
+# ============================================================
+# BOUNDED LRU CACHE
+# ============================================================
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with hit/miss/eviction counters"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = max(0, int(maxsize))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+# ============================================================
+# QUERY EMBEDDING CACHE
+# ============================================================
+_MISSING = object()
+
+class EmbeddingCache(LRUCache):
+    """
+    LRU cache of query embeddings keyed on (model name, normalized query).
+    Only the key is normalized: the model (cased SBERT) encodes the query
+    text as it arrived, so results match an uncached model.encode(query).
+    The first spelling seen for a key is the one that gets encoded.
+    Cached vectors are read-only because they are shared between callers.
+    """
+
+    def encode(self, model, model_name, query):
+        return self.encode_many(model, model_name, [query])[0]
+
+    def encode_many(self, model, model_name, queries):
+        """Encode a list of queries, running the model once over the misses only"""
+        keys = [normalize_query(q) for q in queries]
+        vectors = [self.get((model_name, k), _MISSING) for k in keys]
+
+        # key -> original text of its first occurrence among the misses
+        missing = {}
+        for query, key, vec in zip(queries, keys, vectors):
+            if vec is _MISSING and key not in missing:
+                missing[key] = "" if query is None else str(query)
+        if missing:
+            encoded = model.encode(list(missing.values()), convert_to_numpy=True)
+            fresh = {}
+            for key, vec in zip(missing, encoded):
+                vec = np.array(vec, dtype=np.float32)
+                vec.setflags(write=False)
+                fresh[key] = vec
+                self.put((model_name, key), vec)
+            vectors = [fresh[k] if v is _MISSING else v for k, v in zip(keys, vectors)]
+
+        return vectors
+
+# ============================================================
+# FULL SEARCH RESULT CACHE
+# ============================================================
+def _approx_size(value):
+    """Rough byte estimate of a JSON-like value (for stats, not accounting)"""
+    if isinstance(value, dict):
+        return sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(v) for v in value)
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+class ResultCache(LRUCache):
+    """
+    LRU + TTL cache for complete search() responses.
+    Every entry is tagged with the index version it was computed from;
+    a lookup with a different version (index rebuilt and reloaded)
+    drops the entry instead of serving it.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600.0):
+        super().__init__(maxsize)
+        self.ttl = float(ttl)
+        self.expirations = 0
+        self.invalidations = 0
+        self.approx_bytes = 0
+
+    def _remove(self, key):
+        entry = self._data.pop(key)
+        self.approx_bytes -= entry[2]
+
+    def lookup(self, key, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, entry_version, _, value = entry
+                if entry_version != version:
+                    self._remove(key)
+                    self.invalidations += 1
+                elif expires_at < now:
+                    self._remove(key)
+                    self.expirations += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def store(self, key, version, value):
+        if self.maxsize == 0:
+            return
+        size = _approx_size(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl, version, size, value)
+            self.approx_bytes += size
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.approx_bytes -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.approx_bytes = 0
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                "enabled": RESULT_CACHE_ENABLED,
+                "ttl_s": self.ttl,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "approx_bytes": self.approx_bytes,
+            })
+        return stats
+
+EMBEDDING_CACHE = EmbeddingCache(maxsize=EMBEDDING_CACHE_SIZE)
+RESULT_CACHE = ResultCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
@@ -0,0 +1,76 @@
+"""
+Persisted evaluation report untuk /evaluate.
+
+Evaluator.evaluate() butuh ~40 detik. Hasilnya disimpan di
+evaluation/report.json bersama key = hash dari metadata/semua.json +
+identitas model + parameter sweep. Saat startup report dimuat instan jika
+key-nya cocok; jika tidak, report lama tetap disajikan (ditandai stale)
+sementara report baru dihitung di background.
+
+Beberapa worker gunicorn berbagi file yang sama: hanya satu yang
+menghitung ulang (file lock), yang lain memakai hasilnya.
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each process may recompute
+    fcntl = None
+
+REPORT_FORMAT = 3  # 3: batch_ms / amortized_ms instead of runtime_ms
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(BASE_DIR, "metadata", "semua.json")
+REPORT_PATH = os.environ.get("TASTEFIND_EVAL_REPORT", os.path.join(BASE_DIR, "evaluation", "report.json"))
+
+def file_sha1(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def report_key(model_ids, params, dataset_path=DATASET_PATH):
+    """Identity of a report: corpus content, evaluator models and sweep parameters"""
+    return {
+        "format": REPORT_FORMAT,
+        "dataset_sha1": file_sha1(dataset_path),
+        "models": dict(model_ids),
+        "params": dict(params),
+    }
+
+def load_report(key, path=REPORT_PATH):
+    """(report, fresh): the stored report (None if missing/unreadable) and whether its key matches"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None, False
+    return stored.get("report"), stored.get("key") == key
+
+def save_report(report, key, path=REPORT_PATH):
+    """Atomic write (temp file + rename), so readers never see a partial report"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "generated_at": time.time(), "report": report}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+@contextmanager
+def report_lock(path=REPORT_PATH):
+    """Exclusive cross-process lock around recomputing the report"""
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
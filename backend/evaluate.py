@@ -1,24 +1,77 @@
+import hashlib
+import importlib.util
 import json
 import os
 import time
 import numpy as np
 
-try:
+from array_store import CSR_ARRAYS, arrays_exist, load_arrays, load_csr, save_arrays, save_csr
+from caching import EMBEDDING_CACHE
+from inverted_index import PositionalIndex, tokenize
+from quantization import QUANT_MODES, QuantizedEmbeddings
+from scoring import dense_scores, l2_normalize_rows, sparse_scores, top_k_indices
+
+# sentence_transformers (and torch) is imported on first use only: app.py imports
+# this module, and the served app may run on the ONNX backend without torch
+_SBERT_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+def load_sbert_model(model_name):
     from sentence_transformers import SentenceTransformer
-    _SBERT_AVAILABLE = True
-except Exception:
-    SentenceTransformer = None
-    _SBERT_AVAILABLE = False
+    return SentenceTransformer(model_name)
 
 try:
     from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
     _SKLEARN_AVAILABLE = True
 except Exception:
     TfidfVectorizer = None
-    cosine_similarity = None
     _SKLEARN_AVAILABLE = False
 
+EVAL_SBERT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Batched sweep: queries scored per chunk (bounds the n_queries x n_docs score matrix).
+# Per-query metrics cost microseconds, so they run in-process; a process pool
+# (seconds to start) only takes over when the serial remainder, projected from
+# the first EVAL_POOL_PROBE jobs, exceeds EVAL_POOL_MIN_SECONDS.
+EVAL_BATCH_SIZE = 64
+EVAL_WORKERS = int(os.environ.get("TASTEFIND_EVAL_WORKERS", str(os.cpu_count() or 1)))
+EVAL_POOL_PROBE = 256
+EVAL_POOL_MIN_SECONDS = float(os.environ.get("TASTEFIND_EVAL_POOL_MIN_SECONDS", "10"))
+
+# Fitted TF-IDF, positional index and SBERT corpus vectors, per corpus hash (memory-mapped on load)
+EVAL_CACHE_DIR = os.environ.get(
+    "TASTEFIND_EVAL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation", "cache")
+)
+
+def evaluator_model_ids(engine=False):
+    """Identifiers of the models behind Evaluator rankings (part of the persisted report key)"""
+    if engine:
+        import query_engine
+        return {
+            "mode": "engine",
+            "sbert": query_engine.SBERT_CACHE_NAME,
+            "index": query_engine.artifact_version(query_engine.CORPUS),
+            "tfidf_scorer": query_engine.TFIDF_SCORER,
+            "sbert_ann": f"{query_engine.SBERT_ANN_MODE}/nprobe={query_engine.SBERT_ANN_NPROBE}",
+            "sbert_quantized": query_engine.SBERT_QUANTIZED,
+        }
+    try:
+        import sklearn
+        sklearn_version = sklearn.__version__
+    except Exception:
+        sklearn_version = None
+    return {"sbert": EVAL_SBERT_MODEL_NAME, "tfidf": f"TfidfVectorizer() sklearn {sklearn_version}"}
+
+def corpus_hash(corpus):
+    h = hashlib.sha1()
+    for text in corpus:
+        h.update(text.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+def _model_slug(name):
+    return name.replace("/", "__")
+
 def load_json(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -62,8 +115,51 @@ def mean_average_precision(gt, results):
     return sum(ap_scores) / len(ap_scores)
 
 
+def query_metrics(job):
+    """(relevant, ranked) -> precision / recall / f1 / AP of one query (module-level for process pools)"""
+    relevant, ranked = job
+    if len(relevant) == 0:
+        return {"precision": 0.0, "recall": 0.0, "f1": 0.0, "map": 0.0}
+    p = precision(relevant, ranked)
+    r = recall(relevant, ranked)
+    return {"precision": p, "recall": r, "f1": f1(p, r), "map": average_precision(set(relevant), ranked)}
+
+def compute_metrics(jobs, workers=EVAL_WORKERS):
+    """
+    query_metrics for every job. The first EVAL_POOL_PROBE jobs run serially;
+    the rest go to a process pool only if, at the measured per-job cost, they
+    would take longer than EVAL_POOL_MIN_SECONDS in-process.
+    """
+    jobs = list(jobs)
+    started = time.perf_counter()
+    results = [query_metrics(job) for job in jobs[:EVAL_POOL_PROBE]]
+    rest = jobs[len(results):]
+    if not rest:
+        return results
+
+    per_job = (time.perf_counter() - started) / len(results)
+    if workers > 1 and per_job * len(rest) > EVAL_POOL_MIN_SECONDS:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # forkserver: the sweep runs in a background thread of the server, and a
+        # plain fork there could copy locks held by other threads
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver") if "forkserver" in methods else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results.extend(pool.map(query_metrics, rest, chunksize=max(1, len(rest) // (workers * 4))))
+        return results
+    results.extend(query_metrics(job) for job in rest)
+    return results
+
+
 class Evaluator:
-    def __init__(self, dataset_path=None, ground_truth=None):
+    def __init__(self, dataset_path=None, ground_truth=None, cache_dir=EVAL_CACHE_DIR, engine=False):
+        """
+        engine=False: the evaluator's own TF-IDF and EVAL_SBERT_MODEL_NAME over the dataset.
+        engine=True : rank with query_engine's resident corpus index and SBERT encoder
+                      (search_tfidf / search_sbert, i.e. what /search users get);
+                      no second model is loaded and no TF-IDF is fitted.
+        """
         if dataset_path is None:
             base = os.path.dirname(os.path.abspath(__file__))
             dataset_path = os.path.join(base, "metadata", "semua.json")
@@ -85,15 +181,43 @@ class Evaluator:
                 text = "unknown"
             self.corpus.append(text)
 
-        if not _SKLEARN_AVAILABLE:
-            raise RuntimeError("scikit-learn is required for TF-IDF; install scikit-learn to enable evaluation")
-
-        self.tfidf = TfidfVectorizer()
-        self.tfidf_vectors = self.tfidf.fit_transform(self.corpus)
         self._sbert_model = None
         self._sbert_vectors = None
+        self._sbert_name = EVAL_SBERT_MODEL_NAME
         self._sbert_available = _SBERT_AVAILABLE
 
+        self.engine = None
+        if engine:
+            self._init_engine()
+            return
+
+        if not _SKLEARN_AVAILABLE:
+            raise RuntimeError("scikit-learn is required for TF-IDF; install scikit-learn to enable evaluation")
+
+        # cache_dir=None: fit / build / encode everything in memory every time
+        self.cache_dir = os.path.join(cache_dir, corpus_hash(self.corpus)) if cache_dir else None
+
+        self.positional = self._load_positional()
+        self.tfidf, self.tfidf_vectors = self._load_tfidf()
+
+    def _init_engine(self):
+        """Share query_engine's corpus index (and, lazily, its encoder) instead of building our own"""
+        import query_engine
+
+        self.engine = query_engine
+        index = query_engine.get_index()
+        if len(index) != len(self.corpus):
+            raise ValueError(
+                f"Engine index has {len(index)} documents but the dataset has {len(self.corpus)}; "
+                f"rebuild the index or evaluate without engine=True"
+            )
+        self.cache_dir = None
+        self.positional = index.positional
+        self.tfidf = index.vectorizer
+        self.tfidf_vectors = index.tfidf_matrix
+        self._sbert_name = query_engine.SBERT_CACHE_NAME
+        self._sbert_available = True
+
     def _build_ground_truth_for_query(self, query, pool_indices):
         """Build a conservative ground-truth set for a query.
 
@@ -101,29 +225,25 @@ class Evaluator:
         - If the exact query phrase appears in a document -> relevant.
         - Else, require ALL query terms (length>2) to appear in the document to mark it relevant.
         This prevents overly permissive ground-truth where a single term match counts as relevant.
+
+        Both rules are answered by the positional index (word-boundary tokens),
+        not by scanning the corpus text.
         """
-        query_l = query.lower().strip()
-        q_terms = [t for t in query_l.split() if len(t) > 2]
+        tokens = tokenize(query)
+        q_terms = [t for t in tokens if len(t) > 2]
 
         if not q_terms:
             return []
 
-        relevant = []
-
-        for idx in pool_indices:
-            doc = self.corpus[idx].lower()
+        # exact phrase match (strong signal) | all query terms present
+        phrase_docs = self.positional.docs_with_phrase(tokens)
+        all_terms_docs = self.positional.docs_with_all(q_terms)
+        relevant = np.union1d(phrase_docs, all_terms_docs)
 
-            # exact phrase match (strong signal)
-            if query_l in doc:
-                relevant.append(idx)
-                continue
-
-            # require all query terms to be present
-            term_matches = sum(1 for t in q_terms if t in doc)
-            if term_matches == len(q_terms):
-                relevant.append(idx)
+        if not (isinstance(pool_indices, range) and len(pool_indices) == len(self.corpus)):
+            relevant = np.intersect1d(relevant, np.fromiter(pool_indices, dtype=np.int64))
 
-        return relevant
+        return relevant.astype(int).tolist()
 
     def evaluate_query(self, query, algorithms=("tfidf", "sbert"), top_k=20):
 
@@ -135,6 +255,12 @@ class Evaluator:
 
         sbert_rank = []
         sbert_runtime_ms = 0.0
+        if self._sbert_available:
+            # One-off model load / corpus vectors stay out of the timed region
+            try:
+                self._ensure_sbert()
+            except Exception as e:
+                print(f"[WARN] SBERT unavailable for evaluation: {e}")
         if self._sbert_available:
             start = time.perf_counter()
             sbert_rank = self._rank_cosine_sbert(query, top_k=top_k)
@@ -194,31 +320,88 @@ class Evaluator:
         return result
 
 
+    # ---------- persisted corpus artifacts ----------
+    def _cache_prefix(self, name):
+        return os.path.join(self.cache_dir, name) if self.cache_dir else None
+
+    def _try_save(self, what, save):
+        """Persisting is best effort (e.g. read-only deploys): evaluation still works without it"""
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            save()
+        except OSError as e:
+            print(f"[WARN] Could not persist evaluator {what}: {e}")
+
+    def _load_positional(self):
+        prefix = self._cache_prefix("positional")
+        if prefix and PositionalIndex.exists(prefix):
+            return PositionalIndex.load(prefix)
+        positional = PositionalIndex.build(self.corpus)
+        self._try_save("positional index", lambda: positional.save(prefix))
+        return positional
+
+    def _load_tfidf(self):
+        """Fitted TfidfVectorizer + L2-normalized float32 corpus matrix"""
+        import sklearn
+        prefix = self._cache_prefix(f"tfidf_sklearn-{sklearn.__version__}")
+        if prefix and arrays_exist(prefix, ("vocab", "idf")) and arrays_exist(f"{prefix}_matrix", CSR_ARRAYS):
+            data = load_arrays(prefix, ("vocab", "idf"), mmap=False)
+            # Fixed vocabulary + stored idf_ = the fitted vectorizer, without refitting
+            vectorizer = TfidfVectorizer(vocabulary=data["vocab"].tolist())
+            vectorizer.idf_ = data["idf"]
+            return vectorizer, load_csr(f"{prefix}_matrix")
+
+        vectorizer = TfidfVectorizer()
+        vectors = vectorizer.fit_transform(self.corpus).astype(np.float32)
+
+        def save():
+            save_arrays(prefix, vocab=vectorizer.get_feature_names_out().astype(str), idf=vectorizer.idf_)
+            save_csr(f"{prefix}_matrix", vectors)
+        self._try_save("TF-IDF", save)
+        return vectorizer, vectors
+
+    def _load_sbert_vectors(self):
+        path = self._cache_prefix(f"sbert_{_model_slug(EVAL_SBERT_MODEL_NAME)}.npy")
+        if path and os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        vectors = l2_normalize_rows(self._sbert_model.encode(self.corpus, convert_to_numpy=True))
+        self._try_save("SBERT embeddings", lambda: np.save(path, vectors))
+        return vectors
+
     def _ensure_sbert(self):
         if not self._sbert_available:
             raise RuntimeError("SBERT model not available (sentence-transformers package missing)")
         if self._sbert_model is None or self._sbert_vectors is None:
             try:
-                self._sbert_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-                self._sbert_vectors = self._sbert_model.encode(self.corpus, convert_to_numpy=True)
+                if self.engine is not None:
+                    self._sbert_model = self.engine.get_sbert_model()
+                    self._sbert_vectors = self.engine.get_index().embeddings
+                    return
+                self._sbert_model = load_sbert_model(EVAL_SBERT_MODEL_NAME)
+                self._sbert_vectors = self._load_sbert_vectors()
             except Exception as e:
                 self._sbert_available = False
                 raise
 
     def _rank_tfidf_cosine(self, query, top_k=20):
+        if self.engine is not None:
+            return self.engine.search_tfidf(query, self.engine.CORPUS, top_k=top_k)["indices"]
         q_vec = self.tfidf.transform([query])
-        sim = cosine_similarity(q_vec, self.tfidf_vectors)[0]
-        ranked = np.argsort(sim)[::-1][:top_k]
-        return ranked.tolist()
+        sim = sparse_scores(q_vec, self.tfidf_vectors)[0]
+        return top_k_indices(sim, top_k).tolist()
 
     def _rank_cosine_sbert(self, query, top_k=20):
         self._ensure_sbert()
-        q_vec = self._sbert_model.encode([query])[0]
-        sim = cosine_similarity([q_vec], self._sbert_vectors)[0]
-        ranked = np.argsort(sim)[::-1][:top_k]
-        return ranked.tolist()
-
-    def evaluate(self, sample_size=50, top_k=20):
+        if self.engine is not None:
+            return self.engine.search_sbert(query, self.engine.CORPUS, top_k=top_k)["indices"]
+        q_vec = EMBEDDING_CACHE.encode(self._sbert_model, self._sbert_name, query)
+        sim = dense_scores(l2_normalize_rows(q_vec), self._sbert_vectors)
+        return top_k_indices(sim, top_k).tolist()
+
+    def _sweep_queries(self, sample_size=50):
+        """Most frequent corpus tokens (len > 3), used as the evaluation query set"""
         token_counts = {}
         for doc in self.corpus:
             for tok in doc.split():
@@ -229,18 +412,80 @@ class Evaluator:
 
         candidates = sorted(token_counts.items(), key=lambda x: x[1], reverse=True)
         queries = [tok for tok, _ in candidates[: max(sample_size, 10) ]] if candidates else ["makanan"]
+        return queries[:sample_size]
+
+    def _rank_batch(self, queries, top_k=20):
+        """
+        Ranked doc ids of every query per method, plus total ms per method.
+        One TF-IDF transform and one SBERT encode batch per chunk of queries.
+        Standalone: each scored against the corpus with a single matrix product.
+        Engine mode: scored by query_engine's configured scorers (MaxScore,
+        ANN, quantized rescoring) and thresholds, i.e. what /search serves.
+        """
+        rankings = {"tfidf": [], "sbert": []}
+        elapsed = {"tfidf": 0.0, "sbert": 0.0}
+
+        index = self.engine.get_index() if self.engine is not None else None
+
+        if self._sbert_available:
+            try:
+                self._ensure_sbert()
+            except Exception as e:
+                print(f"[WARN] SBERT unavailable for evaluation: {e}")
+
+        for start_row in range(0, len(queries), EVAL_BATCH_SIZE):
+            chunk = queries[start_row:start_row + EVAL_BATCH_SIZE]
+
+            start = time.perf_counter()
+            if index is not None:
+                q_vecs = self.tfidf.transform([self.engine.minimal_preprocess(q) for q in chunk])
+                hits = self.engine.tfidf_hits_many(index, q_vecs, None, top_k)
+                rankings["tfidf"].extend(h["indices"] for h in hits)
+            else:
+                scores = sparse_scores(self.tfidf.transform(chunk), self.tfidf_vectors)
+                rankings["tfidf"].extend(top_k_indices(row, top_k).tolist() for row in scores)
+            elapsed["tfidf"] += time.perf_counter() - start
+
+            if not self._sbert_available:
+                rankings["sbert"].extend([] for _ in chunk)
+                continue
+            start = time.perf_counter()
+            q_vecs = l2_normalize_rows(np.vstack(EMBEDDING_CACHE.encode_many(self._sbert_model, self._sbert_name, chunk)))
+            if index is not None:
+                hits = self.engine.sbert_hits_many(index, q_vecs, None, top_k)
+                rankings["sbert"].extend(h["indices"] for h in hits)
+            else:
+                scores = dense_scores(q_vecs, self._sbert_vectors)
+                rankings["sbert"].extend(top_k_indices(row, top_k).tolist() for row in scores)
+            elapsed["sbert"] += time.perf_counter() - start
+
+        batch_ms = {algo: secs * 1000 for algo, secs in elapsed.items()}
+        return rankings, batch_ms
+
+    def evaluate(self, sample_size=50, top_k=20, batched=True, workers=EVAL_WORKERS):
+        """
+        Mean precision / recall / f1 / MAP over the sweep queries, plus timings.
+        batched=True: batch ranking (_rank_batch), ground truth from the positional
+        index, metrics via compute_metrics. Timings are batch_ms (whole sweep per
+        method) and amortized_ms (batch_ms / queries); there is no per-query
+        latency, which evaluate_query / batched=False report as runtime_ms.
+        batched=False: evaluate_query once per query, mean runtime_ms.
+        """
+        queries = self._sweep_queries(sample_size)
+        if batched:
+            return self._evaluate_batched(queries, top_k, workers)
 
         agg = {"tfidf": {"precision": [], "recall": [], "f1": [], "map": [], "runtime_ms": []},
                "sbert": {"precision": [], "recall": [], "f1": [], "map": [], "runtime_ms": []}}
 
-        for q in queries[:sample_size]:
+        for q in queries:
             res = self.evaluate_query(q, algorithms=("tfidf", "sbert"), top_k=top_k)
             for algo in ("tfidf", "sbert"):
                 m = res["metrics"].get(algo, {})
                 agg[algo]["precision"].append(m.get("precision", 0.0))
                 agg[algo]["recall"].append(m.get("recall", 0.0))
                 agg[algo]["f1"].append(m.get("f1", 0.0))
-                agg[algo]["map"].append(m.get("ap", 0.0))
+                agg[algo]["map"].append(m.get("map", m.get("ap", 0.0)))
                 agg[algo]["runtime_ms"].append(m.get("runtime_ms", 0.0))
 
         report = {"metrics": {}}
@@ -256,6 +501,76 @@ class Evaluator:
 
         return report
 
+    def _evaluate_batched(self, queries, top_k, workers):
+        relevant = [self._build_ground_truth_for_query(q, range(len(self.corpus))) for q in queries]
+        rankings, batch_ms = self._rank_batch(queries, top_k)
+
+        # One pool for both methods: tfidf jobs first, then sbert
+        algos = ("tfidf", "sbert")
+        per_algo = compute_metrics([(rel, rankings[algo][i]) for algo in algos for i, rel in enumerate(relevant)], workers)
+
+        report = {"queries": len(queries), "metrics": {}}
+        for k, algo in enumerate(algos):
+            per_query = per_algo[k * len(queries):(k + 1) * len(queries)]
+            n = max(1, len(per_query))
+            report["metrics"][algo] = {
+                name: float(sum(m[name] for m in per_query) / n) for name in ("precision", "recall", "f1", "map")
+            }
+            report["metrics"][algo]["batch_ms"] = float(batch_ms[algo])
+            report["metrics"][algo]["amortized_ms"] = float(batch_ms[algo] / n)
+
+        return report
+
+    def evaluate_quantization(self, modes=QUANT_MODES, sample_size=50, top_k=20, rescore_factor=4):
+        """Precision loss of quantized SBERT storage against the float32 vectors.
+
+        For every sweep query the float32 ranking is compared with each mode's
+        ranking, both raw (quantized scan only) and rescored (float32 rescoring
+        of a top_k * rescore_factor shortlist). Reports mean overlap@k with the
+        float32 ranking, the usual metrics and the storage size per variant.
+        """
+        self._ensure_sbert()
+        vectors = self._sbert_vectors
+        queries = self._sweep_queries(sample_size)
+
+        variants = {"float32": None}
+        for mode in modes:
+            quantized = QuantizedEmbeddings.quantize(vectors, mode)
+            variants[f"{mode}"] = quantized
+            variants[f"{mode}+rescore"] = quantized
+
+        agg = {name: {"overlap": [], "precision": [], "recall": [], "f1": [], "map": []} for name in variants}
+
+        for q in queries:
+            relevant = self._build_ground_truth_for_query(q, range(len(self.corpus)))
+            q_vec = l2_normalize_rows(EMBEDDING_CACHE.encode(self._sbert_model, self._sbert_name, q))
+            reference = top_k_indices(dense_scores(q_vec, vectors), top_k).tolist()
+
+            for name, quantized in variants.items():
+                if quantized is None:
+                    ranked = reference
+                elif name.endswith("+rescore"):
+                    ids, _ = quantized.search(q_vec, vectors, top_k, rescore_factor=rescore_factor)
+                    ranked = ids.tolist()
+                else:
+                    ranked = top_k_indices(quantized.approx_scores(q_vec), top_k).tolist()
+
+                p = precision(relevant, ranked)
+                r = recall(relevant, ranked)
+                agg[name]["overlap"].append(len(set(ranked) & set(reference)) / max(1, len(reference)))
+                agg[name]["precision"].append(p)
+                agg[name]["recall"].append(r)
+                agg[name]["f1"].append(f1(p, r))
+                agg[name]["map"].append(average_precision(relevant, ranked))
+
+        report = {"metrics": {}}
+        for name, quantized in variants.items():
+            vals = agg[name]
+            metrics = {k: float(sum(v) / max(1, len(v))) for k, v in vals.items()}
+            metrics["bytes"] = int(vectors.nbytes if quantized is None else quantized.nbytes)
+            report["metrics"][name] = metrics
+
+        return report
 
 if __name__ == "__main__":
     # Demo: test dynamic evaluation untuk berbagai queries
@@ -0,0 +1,46 @@
+"""
+Gunicorn config untuk TasteFind backend:  gunicorn -c gunicorn.conf.py
+
+- preload_app: wsgi.py (index + model + warm-up) dimuat sekali di master,
+  worker hasil fork berbagi memory secara copy-on-write; array index yang
+  di-mmap berbagi page cache OS.
+- Thread BLAS / OpenMP / torch dibatasi per worker (TASTEFIND_COMPUTE_THREADS)
+  supaya workers x threads tidak melebihi jumlah core.
+- Graceful reload: `kill -HUP <master>` men-start worker baru lalu mematikan
+  worker lama setelah request berjalan selesai (graceful_timeout). Dengan
+  preload_app, worker baru memuat ulang index jika artifact sudah di-rebuild.
+  Tanpa HUP pun, worker yang berjalan mengecek versi artifact paling sering
+  tiap TASTEFIND_ARTIFACT_CHECK detik dan memuat ulang index (cache hasil ikut
+  invalid); -HUP tetap lebih hemat memory karena hasil load di-share dari master.
+"""
+
+import multiprocessing
+import os
+
+# Must be set before numpy / torch are imported by the preloaded app
+COMPUTE_THREADS = os.environ.setdefault("TASTEFIND_COMPUTE_THREADS", "1")
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"):
+    os.environ.setdefault(_var, COMPUTE_THREADS)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+wsgi_app = "wsgi:application"
+bind = os.environ.get("TASTEFIND_BIND", "0.0.0.0:5000")
+
+# One process per core; each serves requests on a few threads (numpy / torch release the GIL)
+workers = int(os.environ.get("TASTEFIND_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.environ.get("TASTEFIND_WORKER_THREADS", "4"))
+
+preload_app = True
+timeout = int(os.environ.get("TASTEFIND_WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("TASTEFIND_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Recycle workers now and then (jittered so they don't all restart together)
+max_requests = int(os.environ.get("TASTEFIND_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+def post_fork(server, worker):
+    from app import init_worker
+    init_worker()
+    server.log.info(f"Worker {worker.pid} ready ({threads} threads, {COMPUTE_THREADS} compute threads)")
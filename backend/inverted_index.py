@@ -0,0 +1,171 @@
+"""
+Positional inverted index untuk TasteFind.
+
+Menjawab "dokumen mana yang mengandung frasa persis ini" dan
+"dokumen mana yang mengandung semua kata ini" lewat interseksi
+posting list, bukan substring scan atas seluruh teks korpus.
+
+Dibangun oleh train_tfidf (tfidf/{kategori}_positional.*.npy) dan dipakai
+oleh relevance booster di query_engine serta ground truth di evaluate.
+
+Token = r"\\w+" atas teks lowercase, jadi pencocokan sekarang berbasis
+batas kata ("ayam" tidak lagi cocok dengan "ayamnya").
+"""
+
+import re
+
+import numpy as np
+
+from array_store import arrays_exist, load_arrays, save_arrays
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# ============================================================
+# TOKENIZING
+# ============================================================
+def tokenize(text):
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+def document_text(doc):
+    """(title, full_text) of a metadata row, as relevance scoring sees them"""
+    title = doc.get('Judul', '')
+    content_key = 'Isi Berita' if 'Isi Berita' in doc else 'Isi Resep'
+    content = doc.get(content_key, '')
+    return title, f"{title} {content}"
+
+# ============================================================
+# POSITIONAL INDEX
+# ============================================================
+class PositionalIndex:
+    """
+    CSR-style positional postings: for term id t, the postings are
+    post_docs[term_ptr[t]:term_ptr[t+1]] / post_pos[...], sorted by (doc, pos).
+    title_lengths[d] = number of leading tokens of document d that belong to its title.
+    """
+
+    ARRAYS = ("terms", "term_ptr", "post_docs", "post_pos", "title_lengths")
+
+    def __init__(self, terms, term_ptr, post_docs, post_pos, title_lengths):
+        self.terms = terms
+        self.term_ptr = term_ptr
+        self.post_docs = post_docs
+        self.post_pos = post_pos
+        self.title_lengths = title_lengths
+        self.n_docs = len(title_lengths)
+        self._term_ids = {term: i for i, term in enumerate(terms.tolist())}
+        # Key stride for (doc, start) pairs; larger than any position
+        self._stride = int(post_pos.max()) + 2 if len(post_pos) else 1
+
+    # ---------- build / persist ----------
+    @classmethod
+    def build(cls, texts, titles=None):
+        """texts: full document texts; titles: their leading title parts (optional)"""
+        postings = {}
+        title_lengths = []
+        for doc_id, text in enumerate(texts):
+            title_lengths.append(len(tokenize(titles[doc_id])) if titles is not None else 0)
+            for pos, token in enumerate(tokenize(text)):
+                postings.setdefault(token, []).append((doc_id, pos))
+
+        terms = sorted(postings)
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            term_ptr[i + 1] = term_ptr[i] + len(postings[term])
+
+        pairs = [pair for term in terms for pair in postings[term]]
+        post = np.array(pairs, dtype=np.int32).reshape(-1, 2)
+
+        return cls(
+            np.array(terms, dtype=str),
+            term_ptr,
+            np.ascontiguousarray(post[:, 0]),
+            np.ascontiguousarray(post[:, 1]),
+            np.array(title_lengths, dtype=np.int32),
+        )
+
+    @classmethod
+    def build_from_metadata(cls, docs):
+        titles, texts = zip(*(document_text(doc) for doc in docs)) if docs else ((), ())
+        return cls.build(list(texts), list(titles))
+
+    def save(self, prefix):
+        save_arrays(
+            prefix,
+            terms=self.terms,
+            term_ptr=self.term_ptr,
+            post_docs=self.post_docs,
+            post_pos=self.post_pos,
+            title_lengths=self.title_lengths,
+        )
+
+    @classmethod
+    def exists(cls, prefix):
+        return arrays_exist(prefix, cls.ARRAYS)
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        data = load_arrays(prefix, cls.ARRAYS, mmap=mmap)
+        return cls(data["terms"], data["term_ptr"], data["post_docs"], data["post_pos"], data["title_lengths"])
+
+    # ---------- lookups ----------
+    def postings(self, term):
+        """(docs, positions) of a term; empty arrays if unknown"""
+        t = self._term_ids.get(term)
+        if t is None:
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty
+        start, end = self.term_ptr[t], self.term_ptr[t + 1]
+        return self.post_docs[start:end], self.post_pos[start:end]
+
+    def term_docs(self, term):
+        """Sorted unique documents containing a term"""
+        docs, _ = self.postings(term)
+        return np.unique(docs)
+
+    def docs_with_all(self, tokens):
+        """Documents containing every token (intersection of posting lists, shortest first)"""
+        tokens = list(dict.fromkeys(tokens))
+        if not tokens:
+            return np.empty(0, dtype=np.int32)
+        lists = sorted((self.term_docs(t) for t in tokens), key=len)
+        result = lists[0]
+        for docs in lists[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, docs, assume_unique=True)
+        return result
+
+    def phrase_matches(self, tokens):
+        """
+        All occurrences of the exact token sequence.
+        Returns (docs, starts); a document appears once per occurrence.
+        """
+        if not tokens:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        stride = self._stride
+        keys = None
+        # Rarest term first keeps the running intersection small
+        order = sorted(range(len(tokens)), key=lambda i: len(self.postings(tokens[i])[0]))
+        for i in order:
+            docs, pos = self.postings(tokens[i])
+            valid = pos >= i
+            term_keys = docs[valid].astype(np.int64) * stride + (pos[valid].astype(np.int64) - i)
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys, assume_unique=True)
+            if len(keys) == 0:
+                break
+
+        return keys // stride, keys % stride
+
+    def docs_with_phrase(self, tokens, in_title=False):
+        """Sorted unique documents containing the phrase (optionally: entirely inside the title)"""
+        docs, starts = self.phrase_matches(tokens)
+        if in_title:
+            docs = docs[starts + len(tokens) <= self.title_lengths[docs]]
+        return np.unique(docs)
+
+    def __len__(self):
+        return self.n_docs
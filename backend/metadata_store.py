@@ -0,0 +1,132 @@
+"""
+Compact metadata store untuk TasteFind.
+
+Preprocessing menulis dua file untuk korpus "semua" (satu-satunya index;
+kategori dipilih lewat field kategori per dokumen):
+  metadata/semua.jsonl    -> satu dokumen (sudah dibersihkan) per baris, JSON compact
+  metadata/semua.offsets  -> byte offset awal setiap baris (int64 little-endian, n+1 entri)
+
+Query engine cukup membuka file ini sekali (mmap) lalu mem-parse
+hanya baris top-k yang benar-benar dikembalikan, tanpa membersihkan
+NaN atau memuat seluruh korpus sebagai dict Python di setiap request.
+"""
+
+import json
+import math
+import mmap
+import os
+import sys
+from array import array
+
+STORE_CORPUS = "semua"  # same single index as query_engine.CORPUS
+
+def document_category(doc):
+    """
+    Category of one document ("makanan", "minuman", "sehat", "berita") from
+    its 'kategori' / 'Kategori' field; dataset labels like 'resep_makanan'
+    map to 'makanan'. "" if the document has none.
+    """
+    value = doc.get("kategori") or doc.get("Kategori") or ""
+    value = str(value).strip().lower()
+    return value[len("resep_"):] if value.startswith("resep_") else value
+
+# ============================================================
+# SANITIZING (dilakukan sekali saat build)
+# ============================================================
+def sanitize_value(value):
+    """NaN/inf/None -> empty string (sama seperti query_engine.load_metadata)"""
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return ""
+    if value is None:
+        return ""
+    return value
+
+def sanitize_doc(doc):
+    return {key: sanitize_value(value) for key, value in doc.items()}
+
+# ============================================================
+# WRITE
+# ============================================================
+def store_paths(base_path):
+    """base_path tanpa ekstensi, mis. 'metadata/semua'"""
+    return f"{base_path}.jsonl", f"{base_path}.offsets"
+
+def write_metadata_store(docs, base_path):
+    """Write sanitized docs as compact JSON lines plus an offset index"""
+    data_path, offsets_path = store_paths(base_path)
+
+    offsets = array("q", [0])
+    with open(data_path, "wb") as f:
+        for doc in docs:
+            line = json.dumps(sanitize_doc(doc), ensure_ascii=False, separators=(",", ":"))
+            f.write(line.encode("utf-8"))
+            f.write(b"\n")
+            offsets.append(f.tell())
+
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    with open(offsets_path, "wb") as f:
+        offsets.tofile(f)
+
+    return data_path, offsets_path
+
+# ============================================================
+# READ
+# ============================================================
+class MetadataStore:
+    """
+    Read-only, random-access view over a compact metadata store.
+    Rows are parsed on demand; every access returns a fresh dict,
+    so callers may mutate what they get back.
+    """
+    def __init__(self, base_path):
+        data_path, offsets_path = store_paths(base_path)
+
+        self._offsets = array("q")
+        with open(offsets_path, "rb") as f:
+            self._offsets.frombytes(f.read())
+        if sys.byteorder != "little":
+            self._offsets.byteswap()
+
+        self._file = open(data_path, "rb")
+        if self._offsets[-1] > 0:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""  # mmap tidak bisa memetakan file kosong
+
+    @classmethod
+    def exists(cls, base_path):
+        return all(os.path.exists(p) for p in store_paths(base_path))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError(f"metadata row {i} out of range")
+        raw = self._data[self._offsets[i]:self._offsets[i + 1]]
+        return json.loads(raw.decode("utf-8"))
+
+    def get_many(self, indices):
+        return [self[i] for i in indices]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+# ============================================================
+# REBUILD FROM EXISTING metadata/*.json
+# ============================================================
+def build_from_json(category, metadata_dir="metadata"):
+    """Rebuild the store from metadata/{category}.json without rerunning preprocessing"""
+    with open(os.path.join(metadata_dir, f"{category}.json"), "r", encoding="utf-8") as f:
+        docs = json.load(f)
+    write_metadata_store(docs, os.path.join(metadata_dir, category))
+    return len(docs)
+
+if __name__ == "__main__":
+    total = build_from_json(STORE_CORPUS)
+    print(f"✓ Metadata store {STORE_CORPUS} | total data: {total}")
@@ -1,10 +1,12 @@
 import os
+import sys
 import json
 import re
 import pandas as pd
 import emoji
 from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
 from Sastrawi.StopWordRemover.StopWordRemoverFactory import StopWordRemoverFactory
+from metadata_store import STORE_CORPUS, document_category, write_metadata_store
 
 # =====================
 # PATH
@@ -13,8 +15,14 @@ DATASET_DIR = "dataset"
 TOKENS_DIR = "tokens"
 METADATA_DIR = "metadata"
 
-os.makedirs(TOKENS_DIR, exist_ok=True)
-os.makedirs(METADATA_DIR, exist_ok=True)
+# (file di DATASET_DIR, kategori output)
+SOURCES = [
+    ("berita_kuliner.csv", "berita"),
+    ("resep_makanan.csv", "makanan"),
+    ("resep_minuman.csv", "minuman"),
+    ("resep_sehat.csv", "sehat"),
+    ("semua.csv", "semua"),
+]
 
 # =====================
 # NLP SETUP
@@ -73,6 +81,8 @@ def collect_all_text(item):
 # =====================
 def process_category(filename, kategori):
     path = os.path.join(DATASET_DIR, filename)
+    os.makedirs(TOKENS_DIR, exist_ok=True)
+    os.makedirs(METADATA_DIR, exist_ok=True)
 
     # Load data
     if filename.endswith(".csv"):
@@ -101,7 +111,9 @@ def process_category(filename, kategori):
 
         meta = item.copy()
         meta["Isi Berita"] = content_clean
-        meta["kategori"] = kategori
+        # Kategori asli dokumen (bukan label file, mis. "semua"): query_engine
+        # memakainya sebagai bitmap filter kategori
+        meta["kategori"] = document_category(item) or kategori
         metadata_output.append(meta)
 
         # ===== TOKENS (AMBIL SEMUA KOLOM) =====
@@ -123,15 +135,20 @@ def process_category(filename, kategori):
     with open(f"{METADATA_DIR}/{kategori}.json", "w", encoding="utf-8") as f:
         json.dump(metadata_output, f, ensure_ascii=False, indent=2)
 
+    # Save compact, sanitized metadata store (query_engine hanya membaca index "semua")
+    if kategori == STORE_CORPUS:
+        write_metadata_store(metadata_output, f"{METADATA_DIR}/{kategori}")
+
     print(f"✅ {kategori} selesai | total data: {len(data)}")
 
 # =====================
 # RUN ALL
 # =====================
-process_category("berita_kuliner.csv", "berita")
-process_category("resep_makanan.csv", "makanan")
-process_category("resep_minuman.csv", "minuman")
-process_category("resep_sehat.csv", "sehat")
-process_category("semua.csv", "semua")
-
-print("\n🎉 SEMUA PREPROCESSING BERHASIL")
+# python preprocessing.py                     -> semua SOURCES
+# python preprocessing.py semua.json semua    -> satu file (mis. korpus sintetis)
+if __name__ == "__main__":
+    sources = [tuple(sys.argv[1:3])] if len(sys.argv) >= 3 else SOURCES
+    for filename, kategori in sources:
+        process_category(filename, kategori)
+
+    print("\n🎉 SEMUA PREPROCESSING BERHASIL")
@@ -0,0 +1,103 @@
+"""
+Quantized embedding storage untuk SBERT search.
+
+int8   : per-dimension offset (min) dan scale ((max - min) / 255),
+         x ~= (code + 128) * scale + offset  -> 4x lebih kecil dari float32
+float16: cast langsung (scale = 1, offset = 0) -> 2x lebih kecil
+
+Search melakukan first-pass scan di atas kode quantized, lalu shortlist
+di-rescore dengan vektor float32 asli (dibaca dari disk via mmap).
+Disimpan oleh train_sbert sebagai embeddings/{kategori}_embeddings_{mode}.*.npy.
+"""
+
+import numpy as np
+
+from array_store import arrays_exist, load_arrays, save_arrays
+from scoring import top_k_indices
+
+QUANT_MODES = ("int8", "float16")
+RESCORE_FACTOR = 4        # shortlist = top_k * RESCORE_FACTOR
+MIN_SHORTLIST = 100
+_SCAN_CHUNK = 65536       # rows per chunk; keeps the float32 upcast cache-sized
+
+class QuantizedEmbeddings:
+    ARRAYS = ("codes", "scale", "offset", "mode")
+
+    def __init__(self, codes, scale, offset, mode):
+        if mode not in QUANT_MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.mode = mode
+
+    @classmethod
+    def quantize(cls, embeddings, mode="int8"):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        dim = embeddings.shape[1]
+
+        if mode == "float16":
+            return cls(embeddings.astype(np.float16), np.ones(dim, np.float32), np.zeros(dim, np.float32), mode)
+        if mode != "int8":
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+        lo = embeddings.min(axis=0)
+        hi = embeddings.max(axis=0)
+        scale = ((hi - lo) / 255.0).astype(np.float32)
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint((embeddings - lo) / scale) - 128, -128, 127).astype(np.int8)
+        return cls(codes, scale, lo.astype(np.float32), mode)
+
+    def save(self, prefix):
+        save_arrays(prefix, codes=self.codes, scale=self.scale, offset=self.offset, mode=np.array(self.mode))
+
+    @classmethod
+    def exists(cls, prefix):
+        return arrays_exist(prefix, cls.ARRAYS)
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        data = load_arrays(prefix, cls.ARRAYS, mmap=mmap)
+        return cls(data["codes"], data["scale"], data["offset"], str(data["mode"]))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def dequantize(self, ids=None):
+        codes = self.codes if ids is None else self.codes[ids]
+        if self.mode == "float16":
+            return codes.astype(np.float32)
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.offset
+
+    def approx_scores(self, query):
+        """Approximate dot products of a float32 query against every stored vector"""
+        query = np.asarray(query, dtype=np.float32)
+        if self.mode == "float16":
+            weights, bias = query, 0.0
+        else:
+            # q . ((c + 128) * s + o) = c . (q * s) + 128 * sum(q * s) + q . o
+            weights = query * self.scale
+            bias = float(128.0 * weights.sum() + query @ self.offset)
+
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), _SCAN_CHUNK):
+            chunk = self.codes[start:start + _SCAN_CHUNK]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ weights
+        return scores + bias
+
+    def search(self, query, embeddings, top_k, min_score=None, rescore_factor=RESCORE_FACTOR, mask=None):
+        """
+        (ids, scores) best first: quantized first pass, float32 rescoring of
+        a shortlist. embeddings may be a memmap; only shortlisted rows are read.
+        mask: allowed documents, applied before the shortlist is drawn.
+        """
+        shortlist_size = max(top_k * rescore_factor, MIN_SHORTLIST)
+        shortlist = top_k_indices(self.approx_scores(query), shortlist_size, mask=mask)
+        shortlist.sort()  # sequential reads from the (memory-mapped) float32 file
+        exact = np.asarray(embeddings[shortlist], dtype=np.float32) @ query
+        order = top_k_indices(exact, top_k, min_score=min_score)
+        return shortlist[order], exact[order]
@@ -3,16 +3,52 @@ Query Engine untuk TasteFind - PRODUCTION VERSION
 FIXED: Preprocessing, NaN handling, scoring accuracy
 """
 
+import glob
+import hashlib
 import json
+import os
 import pickle
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from types import MappingProxyType
 import numpy as np
 from scipy.sparse import load_npz
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 import re
+from metadata_store import MetadataStore, document_category
+from array_store import CSR_ARRAYS, arrays_exist, load_csr
+from caching import EMBEDDING_CACHE, RESULT_CACHE, RESULT_CACHE_ENABLED, normalize_query
+from tfidf_index import TfidfPostings
+from tfidf_model import TfidfModel
+from sbert_backend import cache_name, load_encoder
+from ann_index import ANN_MIN_DOCS, DEFAULT_N_PROBE, IVFFlatIndex
+from quantization import QUANT_MODES, QuantizedEmbeddings
+from inverted_index import PositionalIndex, document_text, tokenize
+from scoring import dense_scores, is_l2_normalized, l2_normalize_rows, sparse_scores, top_k_indices
 
 # Load SBERT model once
 SBERT_MODEL = None
+_SBERT_LOCK = threading.Lock()
+SBERT_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# Query encoder: "torch" (SentenceTransformer) or "onnx" (onnxruntime, exported once with
+# `python sbert_backend.py export [--int8]`); TASTEFIND_SBERT_INT8=1 picks the int8 ONNX model
+SBERT_BACKEND = os.environ.get("TASTEFIND_SBERT_BACKEND", "torch")
+SBERT_INT8 = os.environ.get("TASTEFIND_SBERT_INT8", "0") == "1"
+SBERT_CACHE_NAME = cache_name(SBERT_MODEL_NAME, SBERT_BACKEND, SBERT_INT8)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Root of metadata/, tfidf/ and embeddings/ (synthetic.py points it at a generated corpus)
+DATA_DIR = os.environ.get("TASTEFIND_DATA_DIR", BASE_DIR)
+# Resident indexes re-stat their artifacts at most this often and reload when
+# preprocessing / training rewrote them (new version -> result cache misses)
+ARTIFACT_CHECK_S = float(os.environ.get("TASTEFIND_ARTIFACT_CHECK", "5"))
+# One corpus-wide index ("semua"); categories are per-document bits used as a
+# pre-filter mask at scoring time, so any combination costs the same as one
+CORPUS = "semua"
+DOC_CATEGORIES = ["makanan", "minuman", "sehat", "berita"]
+CATEGORY_BITS = {cat: 1 << i for i, cat in enumerate(DOC_CATEGORIES)}
+CATEGORIES = DOC_CATEGORIES + [CORPUS]
 
 # ============================================================
 # CONFIGURATION
@@ -21,6 +57,30 @@ TFIDF_MIN_SCORE = 0.01  # Very low threshold - let relevance check do the filter
 SBERT_MIN_SCORE = 0.25  # Lower threshold
 TFIDF_WEIGHT = 0.5
 SBERT_WEIGHT = 0.5
+CANDIDATES_PER_BRANCH = 30  # Hits taken from each branch before fusion
+
+# TF-IDF top-k: "maxscore" = inverted index with MaxScore pruning (exact, scores only
+# documents that can reach the top-k); "exhaustive" = sparse product over every document
+TFIDF_SCORER = os.environ.get("TASTEFIND_TFIDF_SCORER", "maxscore")
+
+# SBERT approximate nearest-neighbor search (IVF-flat, built by train_sbert)
+# "auto": use the ANN index when one exists and the searched categories have >= ANN_MIN_DOCS docs
+# "exact": always brute force; "ann": use the ANN index whenever one exists
+SBERT_ANN_MODE = os.environ.get("TASTEFIND_SBERT_ANN", "auto")
+SBERT_ANN_NPROBE = int(os.environ.get("TASTEFIND_SBERT_NPROBE", str(DEFAULT_N_PROBE)))  # recall/latency knob
+
+# Quantized first-pass scan ("int8" / "float16", written by train_sbert) with float32
+# rescoring of the shortlist; float32 vectors are then memory-mapped, not resident
+SBERT_QUANTIZED = os.environ.get("TASTEFIND_SBERT_QUANTIZED", "none")
+
+# Run TF-IDF and SBERT branches in parallel (numpy/scipy/torch release the GIL)
+SEARCH_CONCURRENT = os.environ.get("TASTEFIND_SEARCH_CONCURRENT", "1") != "0"
+SEARCH_THREADS = int(os.environ.get("TASTEFIND_SEARCH_THREADS", "4"))
+TFIDF_TIMEOUT_S = float(os.environ.get("TASTEFIND_TFIDF_TIMEOUT", "5"))
+SBERT_TIMEOUT_S = float(os.environ.get("TASTEFIND_SBERT_TIMEOUT", "10"))
+# True: a branch that misses its deadline is dropped and the other branch's hits are used
+# False: deadlines are ignored and search() waits for both branches
+BRANCH_TIMEOUT_FALLBACK = os.environ.get("TASTEFIND_BRANCH_FALLBACK", "1") != "0"
 
 # ============================================================
 # SIMPLE TOKENIZER (must be at module level for pickle)
@@ -36,8 +96,10 @@ def get_sbert_model():
     """Load SBERT model lazily"""
     global SBERT_MODEL
     if SBERT_MODEL is None:
-        print("[INFO] Loading SBERT model...")
-        SBERT_MODEL = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+        with _SBERT_LOCK:
+            if SBERT_MODEL is None:
+                print(f"[INFO] Loading SBERT model ({SBERT_BACKEND} backend)...")
+                SBERT_MODEL = load_encoder(SBERT_MODEL_NAME, SBERT_BACKEND, SBERT_INT8)
     return SBERT_MODEL
 
 # ============================================================
@@ -87,44 +149,102 @@ def calculate_word_overlap(query, text):
 # ============================================================
 # COOKING METHOD CONFLICT DETECTION
 # ============================================================
+# Define cooking method conflicts (default table)
+# Override with a JSON file {"method": ["conflicting", ...]} via TASTEFIND_COOKING_CONFLICTS
+COOKING_METHODS = {
+    'bakar': ['goreng', 'rebus', 'kukus', 'tumis'],
+    'goreng': ['bakar', 'rebus', 'kukus'],
+    'rebus': ['bakar', 'goreng', 'kukus', 'tumis'],
+    'kukus': ['bakar', 'goreng', 'rebus', 'tumis'],
+    'tumis': ['bakar', 'rebus', 'kukus']
+}
+COOKING_CONFLICTS_PATH = os.environ.get("TASTEFIND_COOKING_CONFLICTS")
+
+class CookingConflictTable:
+    """
+    Cooking-method conflict table compiled to bitmasks.
+    Every method gets one bit; a document's mask has the bit set when the
+    method occurs (substring) in its text. A query is parsed once into
+    (method bit, conflicting bits), so rejecting a candidate is one bitwise test.
+    """
+    def __init__(self, conflicts):
+        self.conflicts = {method: list(others) for method, others in conflicts.items()}
+        methods = list(dict.fromkeys(
+            list(self.conflicts) + [m for others in self.conflicts.values() for m in others]
+        ))
+        if len(methods) > 64:
+            raise ValueError(f"At most 64 cooking methods are supported, got {len(methods)}")
+        self.methods = methods
+        self.bits = {method: 1 << i for i, method in enumerate(methods)}
+        self.conflict_bits = {
+            method: sum(self.bits[m] for m in set(others))
+            for method, others in self.conflicts.items()
+        }
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def doc_mask(self, text_clean):
+        """Bitmask of methods present in already-preprocessed document text"""
+        mask = 0
+        for method, bit in self.bits.items():
+            if method in text_clean:
+                mask |= bit
+        return mask
+
+    def query_plan(self, query_clean):
+        """(method bit, conflicting bits) of the first method found in the query, or (0, 0)"""
+        for method in self.conflicts.keys():
+            if method in query_clean:
+                return self.bits[method], self.conflict_bits[method]
+        return 0, 0
+
+    def conflicts_with(self, masks, plan):
+        """Vectorized: which document masks conflict with a query plan"""
+        method_bit, conflict_bits = plan
+        masks = np.asarray(masks, dtype=np.uint64)
+        return ((masks & np.uint64(method_bit)) == 0) & ((masks & np.uint64(conflict_bits)) != 0)
+
+    def has_conflict(self, query_clean, text_clean):
+        method_bit, conflict_bits = self.query_plan(query_clean)
+        if not method_bit:
+            return False
+        mask = self.doc_mask(text_clean)
+        return not (mask & method_bit) and bool(mask & conflict_bits)
+
+def load_cooking_table():
+    if COOKING_CONFLICTS_PATH:
+        print(f"[INFO] Loading cooking conflict table from {COOKING_CONFLICTS_PATH}")
+        return CookingConflictTable.from_file(COOKING_CONFLICTS_PATH)
+    return CookingConflictTable(COOKING_METHODS)
+
+COOKING_TABLE = load_cooking_table()
+
 def has_cooking_conflict(query, text):
     """
     Check if document has conflicting cooking method
     Example: query="ayam bakar" should NOT match "ayam goreng"
     """
-    query_lower = minimal_preprocess(query)
-    text_lower = minimal_preprocess(text)
-    
-    # Define cooking method conflicts
-    cooking_methods = {
-        'bakar': ['goreng', 'rebus', 'kukus', 'tumis'],
-        'goreng': ['bakar', 'rebus', 'kukus'],
-        'rebus': ['bakar', 'goreng', 'kukus', 'tumis'],
-        'kukus': ['bakar', 'goreng', 'rebus', 'tumis'],
-        'tumis': ['bakar', 'rebus', 'kukus']
-    }
-    
-    # Check if query contains a cooking method
-    query_method = None
-    for method in cooking_methods.keys():
-        if method in query_lower:
-            query_method = method
-            break
-    
-    # If no cooking method in query, no conflict
-    if not query_method:
-        return False
-    
-    # If query method is in document, no conflict
-    if query_method in text_lower:
-        return False
-    
-    # Check if document has conflicting method
-    for conflict_method in cooking_methods[query_method]:
-        if conflict_method in text_lower:
-            return True  # Conflict found!
-    
-    return False
+    return COOKING_TABLE.has_conflict(minimal_preprocess(query), minimal_preprocess(text))
+
+# ============================================================
+# TEXT FEATURES (single-document path)
+# ============================================================
+# Per document: minimal_preprocess'd title, minimal_preprocess'd "title content"
+# and the word set of the latter. search() uses the positional index instead.
+DocFeatures = namedtuple("DocFeatures", ["title", "text", "words"])
+QueryFeatures = namedtuple("QueryFeatures", ["text", "words"])
+
+def doc_features(doc):
+    title, full_text = document_text(doc)
+    text_clean = minimal_preprocess(full_text)
+    return DocFeatures(minimal_preprocess(title), text_clean, frozenset(text_clean.split()))
+
+def query_features(query):
+    query_clean = minimal_preprocess(query)
+    return QueryFeatures(query_clean, frozenset(query_clean.split()))
 
 # ============================================================
 # RELEVANCE SCORING
@@ -134,44 +254,86 @@ def calculate_relevance_score(query, doc):
     Calculate relevance score based on phrase matching
     Returns: float (0-1)
     """
-    # Get document text
-    title = doc.get('Judul', '')
-    content_key = 'Isi Berita' if 'Isi Berita' in doc else 'Isi Resep'
-    content = doc.get(content_key, '')
-    full_text = f"{title} {content}"
+    return relevance_from_features(query_features(query), doc_features(doc))
+
+def relevance_from_features(q, d, conflict=None):
+    """
+    calculate_relevance_score on precomputed QueryFeatures / DocFeatures
+    (no regex, string building or set construction per candidate)
+    conflict: precomputed cooking-conflict flag; checked on the text if None
+    """
+    if conflict is None:
+        conflict = COOKING_TABLE.has_conflict(q.text, d.text)
     
     # 1. Exact phrase match in title = highest score
-    if check_exact_phrase(query, title):
+    if q.text in d.title:
         return 1.0
     
     # 2. Exact phrase match in content = high score
-    if check_exact_phrase(query, full_text):
+    if q.text in d.text:
         return 0.9
     
     # 3. All words present = good score
-    if check_all_words_present(query, full_text):
+    if q.words <= d.words:
         # But check for cooking method conflicts
-        if has_cooking_conflict(query, full_text):
+        if conflict:
             return 0.0  # REJECT conflicting documents
         return 0.7
     
     # 4. Partial word overlap
-    overlap = calculate_word_overlap(query, full_text)
+    overlap = len(q.words & d.words) / len(q.words) if q.words else 0.0
     if overlap > 0.5:  # At least 50% words match
         # Check for conflicts
-        if has_cooking_conflict(query, full_text):
+        if conflict:
             return 0.0
         return 0.4 * overlap
     
     # 5. Low relevance
     return 0.1 * overlap
 
+def relevance_scores(query, candidates, positional):
+    """
+    Vectorized relevance for an array of candidate doc ids, answered from the
+    positional index by posting-list intersection instead of substring scans.
+    Same tiers as calculate_relevance_score, on word-boundary tokens:
+    phrase in title 1.0, phrase 0.9, all words 0.7, else 0.4/0.1 * overlap.
+    Cooking conflicts are applied by the caller.
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    tokens = tokenize(query)
+    if not tokens or len(candidates) == 0:
+        return np.zeros(len(candidates))
+    
+    # 4./5. Word overlap
+    terms = list(dict.fromkeys(tokens))
+    hits = np.zeros(len(candidates))
+    for term in terms:
+        hits += np.isin(candidates, positional.term_docs(term))
+    overlap = hits / len(terms)
+    relevance = np.where(overlap > 0.5, 0.4 * overlap, 0.1 * overlap)
+    
+    # 3. All words present
+    relevance[hits == len(terms)] = 0.7
+    
+    # 2./1. Exact phrase (anywhere / inside the title)
+    docs, starts = positional.phrase_matches(tokens)
+    if len(docs):
+        relevance[np.isin(candidates, docs)] = 0.9
+        title_docs = docs[starts + len(tokens) <= positional.title_lengths[docs]]
+        relevance[np.isin(candidates, title_docs)] = 1.0
+    
+    return relevance
+
 # ============================================================
 # LOAD METADATA - WITH NaN CLEANING
 # ============================================================
 def load_metadata(category):
-    """Load and clean metadata"""
-    json_path = f"metadata/{category}.json"
+    """
+    Load and clean metadata from metadata/{category}.json
+    Fallback only - preprocessing writes an already-cleaned store
+    (see open_metadata / metadata_store.py)
+    """
+    json_path = os.path.join(DATA_DIR, "metadata", f"{category}.json")
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
     
@@ -193,27 +355,339 @@ def load_metadata(category):
     
     return cleaned
 
+def open_metadata(category):
+    """
+    Open the compact metadata store written by preprocessing.
+    Rows are parsed on demand, so only returned top-k rows become dicts.
+    Falls back to cleaning metadata/{category}.json once if the store is missing.
+    """
+    base_path = os.path.join(DATA_DIR, "metadata", category)
+    if MetadataStore.exists(base_path):
+        return MetadataStore(base_path)
+    
+    print(f"[WARN] No metadata store for '{category}', cleaning {category}.json in memory")
+    return tuple(MappingProxyType(doc) for doc in load_metadata(category))
+
+# ============================================================
+# LOAD TF-IDF MODEL
+# ============================================================
+def load_tfidf_model(name):
+    """
+    Compact TF-IDF model written by train_tfidf (no unpickling, no sklearn at query time);
+    falls back to the pickled vectorizer of older builds
+    """
+    prefix = os.path.join(DATA_DIR, "tfidf", f"{name}_model")
+    if TfidfModel.exists(prefix):
+        return TfidfModel.load(prefix)
+    
+    print(f"[WARN] No compact TF-IDF model for '{name}', unpickling the sklearn vectorizer "
+          f"(run tfidf_model.py to convert it)")
+    return load_vectorizer(name)
+
+def load_vectorizer(category):
+    """Unpickle a legacy TF-IDF vectorizer, remapping simple_tokenizer to this module"""
+    class PickleUnpickler(pickle.Unpickler):
+        def find_class(self, module, name):
+            if name == 'simple_tokenizer':
+                return simple_tokenizer
+            return super().find_class(module, name)
+    
+    path = os.path.join(DATA_DIR, "tfidf", f"{category}_vectorizer.pkl")
+    with open(path, "rb") as f:
+        return PickleUnpickler(f).load()
+
+# ============================================================
+# LOAD POSITIONAL INDEX
+# ============================================================
+def load_positional_index(category, metadata):
+    """Positional index written by train_tfidf; built from metadata if missing"""
+    prefix = os.path.join(DATA_DIR, "tfidf", f"{category}_positional")
+    if PositionalIndex.exists(prefix):
+        return PositionalIndex.load(prefix)
+    
+    print(f"[WARN] No positional index for '{category}', building it in memory "
+          f"(run train_tfidf.py --convert to share it via mmap)")
+    return PositionalIndex.build_from_metadata(list(metadata))
+
+def load_tfidf_postings(name, tfidf_matrix):
+    """Term-major postings written by train_tfidf; built from the matrix if missing"""
+    prefix = os.path.join(DATA_DIR, "tfidf", f"{name}_postings")
+    if TfidfPostings.exists(prefix):
+        return TfidfPostings.load(prefix)
+    
+    print(f"[WARN] No TF-IDF postings for '{name}', building them in memory "
+          f"(run train_tfidf.py --convert to share them via mmap)")
+    return TfidfPostings.build(tfidf_matrix)
+
+# ============================================================
+# INDEX REGISTRY - ARTIFACTS STAY RESIDENT
+# ============================================================
+def _readonly(array):
+    """Mark a numpy/scipy buffer read-only so shared references stay immutable"""
+    array.setflags(write=False)
+    return array
+
+def artifact_paths(name):
+    """Every file written for an index by preprocessing / train_tfidf / train_sbert"""
+    patterns = [
+        os.path.join(DATA_DIR, "tfidf", f"{name}_*"),
+        os.path.join(DATA_DIR, "embeddings", f"{name}_*"),
+        os.path.join(DATA_DIR, "metadata", f"{name}.*"),
+    ]
+    return sorted(path for pattern in patterns for path in glob.glob(pattern))
+
+def artifact_version(name):
+    """
+    Build version of an index: hash of artifact sizes and mtimes.
+    Changes whenever preprocessing / training rewrites any artifact.
+    """
+    h = hashlib.sha1()
+    for path in artifact_paths(name):
+        if os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+def resolve_categories(category):
+    """
+    Normalize a category filter to a sorted tuple of document categories.
+    "semua" / None / every category -> None (whole corpus);
+    "makanan", "makanan,minuman" or ["makanan", "minuman"] -> ("makanan", "minuman")
+    """
+    if category is None:
+        return None
+    names = category.split(",") if isinstance(category, str) else list(category)
+    names = {str(name).strip().lower() for name in names if str(name).strip()}
+    if not names or CORPUS in names:
+        return None
+    
+    unknown = names - CATEGORY_BITS.keys()
+    if unknown:
+        raise ValueError(f"Unknown category: {', '.join(sorted(unknown))}")
+    if len(names) == len(CATEGORY_BITS):
+        return None
+    return tuple(sorted(names))
+
+def category_bits(metadata):
+    """Per-document category bitmap from the 'kategori' field written by preprocessing ('Kategori' accepted)"""
+    return np.array([CATEGORY_BITS.get(document_category(doc), 0) for doc in metadata], dtype=np.uint8)
+
+class CorpusIndex:
+    """
+    Everything needed to serve the whole corpus, loaded once.
+    Arrays are read-only and metadata is a read-only store,
+    so the same instance can be handed to concurrent requests.
+    Categories are selected with category_mask(), not separate indexes.
+    """
+    def __init__(self, name, vectorizer, tfidf_matrix, tfidf_postings, embeddings, ann, quantized, metadata,
+                 positional, cooking_masks, category_bits, version):
+        self.name = name
+        self.version = version
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.tfidf_postings = tfidf_postings
+        self.embeddings = embeddings
+        self.ann = ann
+        self.quantized = quantized
+        self.metadata = metadata
+        self.positional = positional
+        self.cooking_masks = cooking_masks
+        self.category_bits = category_bits
+        self._category_masks = {}
+
+    def category_mask(self, category):
+        """Boolean pre-filter of the documents in a category filter; None = every document"""
+        names = resolve_categories(category)
+        if names is None:
+            return None
+        
+        mask = self._category_masks.get(names)
+        if mask is None:
+            wanted = 0
+            for name in names:
+                wanted |= CATEGORY_BITS[name]
+            mask = _readonly((self.category_bits & wanted) != 0)
+            self._category_masks[names] = mask
+        return mask
+
+    def __len__(self):
+        return len(self.metadata)
+
+class IndexRegistry:
+    """
+    Thread-safe, lazily populated registry of CorpusIndex instances.
+    Each index is read from disk once per process, and again when
+    artifact_version() changes (checked every ARTIFACT_CHECK_S seconds)
+    or reload() is called.
+    """
+    def __init__(self):
+        self._indexes = {}
+        self._next_check = {}
+        self._lock = threading.Lock()
+
+    def get(self, name=CORPUS):
+        index = self._indexes.get(name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._load(name)
+                    self._indexes[name] = index
+                    self._next_check[name] = time.monotonic() + ARTIFACT_CHECK_S
+        elif time.monotonic() >= self._next_check.get(name, 0.0):
+            index = self._refresh(name, index)
+        return index
+
+    def _refresh(self, name, index):
+        """Reload an index whose artifacts changed on disk; other callers keep the old one meanwhile"""
+        with self._lock:
+            if self._indexes.get(name) is not index or time.monotonic() < self._next_check.get(name, 0.0):
+                return self._indexes.get(name, index)
+            self._next_check[name] = time.monotonic() + ARTIFACT_CHECK_S
+            if artifact_version(name) == index.version:
+                return index
+            print(f"[INFO] Artifacts of '{name}' changed on disk, reloading")
+            try:
+                fresh = self._load(name)
+            except Exception as e:
+                # e.g. training still writing: keep serving the old index, retry on the next check
+                print(f"[WARN] Reloading '{name}' failed, keeping version {index.version}: {e}")
+                return index
+            self._indexes[name] = fresh
+            return fresh
+
+    def load_all(self, names=None):
+        """Eagerly load the indexes (e.g. at app startup)"""
+        for name in names or [CORPUS]:
+            self.get(name)
+
+    def reload(self, name=None):
+        """Drop resident indexes so the next get() re-reads them from disk"""
+        with self._lock:
+            if name is None:
+                self._indexes.clear()
+                self._next_check.clear()
+            else:
+                self._indexes.pop(name, None)
+                self._next_check.pop(name, None)
+
+    def loaded_indexes(self):
+        return list(self._indexes.keys())
+
+    def _load(self, name):
+        print(f"[INFO] Loading index '{name}'...")
+        version = artifact_version(name)
+        vectorizer = load_tfidf_model(name)
+        
+        # train_tfidf writes L2-normalized float32 rows (sklearn norm='l2'),
+        # so scoring is a plain sparse dot product
+        # Raw CSR arrays are memory-mapped (shared page cache across workers);
+        # the older compressed .npz is decompressed into private memory
+        csr_prefix = os.path.join(DATA_DIR, "tfidf", f"{name}_csr")
+        if arrays_exist(csr_prefix, CSR_ARRAYS):
+            tfidf_matrix = load_csr(csr_prefix)
+        else:
+            print(f"[WARN] No raw CSR arrays for '{name}', decompressing {name}_matrix.npz in memory "
+                  f"(run train_tfidf.py --convert to share it via mmap)")
+            tfidf_matrix = load_npz(os.path.join(DATA_DIR, "tfidf", f"{name}_matrix.npz")).tocsr()
+        if tfidf_matrix.dtype != np.float32:
+            tfidf_matrix = tfidf_matrix.astype(np.float32)
+        for buf in (tfidf_matrix.data, tfidf_matrix.indices, tfidf_matrix.indptr):
+            _readonly(buf)
+        tfidf_postings = load_tfidf_postings(name, tfidf_matrix)
+        
+        # Quantized codes are scanned in full; the float32 matrix is then only
+        # touched for shortlist rescoring
+        quantized = None
+        quant_prefix = os.path.join(DATA_DIR, "embeddings", f"{name}_embeddings_{SBERT_QUANTIZED}")
+        if SBERT_QUANTIZED in QUANT_MODES and QuantizedEmbeddings.exists(quant_prefix):
+            quantized = QuantizedEmbeddings.load(quant_prefix)
+        
+        # train_sbert writes unit-length float32 rows, which are served straight
+        # from the memory-mapped file; older artifacts get a normalized private copy
+        embeddings = np.load(os.path.join(DATA_DIR, "embeddings", f"{name}_embeddings.npy"), mmap_mode="r")
+        if embeddings.dtype != np.float32 or not is_l2_normalized(embeddings):
+            print(f"[WARN] Embeddings for '{name}' are not unit-length float32, "
+                  f"normalizing in memory (run train_sbert.py --convert to share them via mmap)")
+            embeddings = _readonly(l2_normalize_rows(embeddings))
+        
+        ann_prefix = os.path.join(DATA_DIR, "embeddings", f"{name}_ivf")
+        ann = IVFFlatIndex.load(ann_prefix) if IVFFlatIndex.exists(ann_prefix) else None
+        metadata = open_metadata(name)
+        positional = load_positional_index(name, metadata)
+        cooking_masks = _readonly(np.array(
+            [COOKING_TABLE.doc_mask(minimal_preprocess(document_text(doc)[1])) for doc in metadata],
+            dtype=np.uint64
+        ))
+        
+        bits = _readonly(category_bits(metadata))
+        missing = int(np.count_nonzero(bits == 0))
+        if missing == len(bits) and len(bits):
+            raise ValueError(f"No document in '{name}' has a known category (kategori field); "
+                             f"re-run preprocessing.py")
+        if missing:
+            print(f"[WARN] {missing} of {len(bits)} documents in '{name}' have no known category "
+                  f"and only match category '{CORPUS}'")
+
+        return CorpusIndex(name, vectorizer, tfidf_matrix, tfidf_postings, embeddings, ann, quantized, metadata,
+                           positional, cooking_masks, bits, version)
+
+INDEX_REGISTRY = IndexRegistry()
+
+def get_index(name=CORPUS):
+    """Return the resident corpus index, loading it on first use"""
+    return INDEX_REGISTRY.get(name)
+
+# ============================================================
+# SCORE -> TOP-K HITS
+# ============================================================
+def _empty_hits():
+    return {"indices": [], "scores": []}
+
+def hits_from(ids, scores):
+    """
+    Hits dict from already-ranked doc ids and their scores.
+    No metadata: fuse_results reads it for the final top_k only.
+    """
+    if len(ids) == 0:
+        return _empty_hits()
+    
+    return {
+        "indices": [int(i) for i in ids],
+        "scores": [float(x) for x in scores],
+    }
+
+def top_hits(scores, min_score, top_k, mask=None):
+    """Threshold (and category-mask) a score vector and return the top_k hits, best first"""
+    sorted_idx = top_k_indices(scores, top_k, min_score=min_score, mask=mask)
+    return hits_from(sorted_idx, scores[sorted_idx])
+
 # ============================================================
 # TF-IDF SEARCH
 # ============================================================
+def tfidf_hits_many(index, q_vecs, mask, top_k):
+    """
+    Hits per row of an n x V query matrix, using the configured TF-IDF scorer.
+    Shared by search_tfidf and search_many, so both return the same hits.
+    """
+    if TFIDF_SCORER == "maxscore":
+        # Walk the query terms' postings; documents that can't reach the top_k are never scored
+        results = []
+        for row in range(q_vecs.shape[0]):
+            ids, scores = index.tfidf_postings.search(q_vecs[row], top_k, min_score=TFIDF_MIN_SCORE, mask=mask)
+            results.append(hits_from(ids, scores))
+        return results
+    
+    # Calculate similarity for the whole batch (rows and queries are L2-normalized -> dot product),
+    # then take the top results (with low threshold) among the category's documents
+    scores = sparse_scores(q_vecs, index.tfidf_matrix)
+    return [top_hits(row, TFIDF_MIN_SCORE, top_k, mask) for row in scores]
+
 def search_tfidf(query, category, top_k=20):
     """TF-IDF search with minimal preprocessing"""
     try:
-        # Load vectorizer & matrix
-        class PickleUnpickler(pickle.Unpickler):
-            def find_class(self, module, name):
-                if name == 'simple_tokenizer':
-                    return simple_tokenizer
-                return super().find_class(module, name)
-        
-        try:
-            with open(f"tfidf/{category}_vectorizer.pkl", "rb") as f:
-                vectorizer = PickleUnpickler(f).load()
-        except:
-            vectorizer = pickle.load(open(f"tfidf/{category}_vectorizer.pkl", "rb"))
-        
-        tfidf_matrix = load_npz(f"tfidf/{category}_matrix.npz")
-        metadata = load_metadata(category)
+        index = get_index()
+        mask = index.category_mask(category)
         
         # Minimal preprocessing - just lowercase and join
         query_processed = minimal_preprocess(query)
@@ -221,26 +695,12 @@ def search_tfidf(query, category, top_k=20):
         print(f"[TF-IDF] Query: '{query}' -> '{query_processed}'")
         
         # Transform query
-        q_vec = vectorizer.transform([query_processed])
-        
-        # Calculate similarity
-        scores = cosine_similarity(q_vec, tfidf_matrix).flatten()
+        q_vec = index.vectorizer.transform([query_processed])
+        results = tfidf_hits_many(index, q_vec, mask, top_k)[0]
         
-        # Get top results (with low threshold)
-        valid_idx = np.where(scores >= TFIDF_MIN_SCORE)[0]
-        
-        if len(valid_idx) == 0:
+        if not results["indices"]:
             print(f"[TF-IDF] No results found")
-            return {"indices": [], "scores": [], "metadata": []}
-        
-        # Sort by score
-        sorted_idx = valid_idx[np.argsort(scores[valid_idx])[::-1]][:top_k]
-        
-        results = {
-            "indices": [int(i) for i in sorted_idx],
-            "scores": [float(scores[i]) for i in sorted_idx],
-            "metadata": [metadata[i] for i in sorted_idx]
-        }
+            return results
         
         print(f"[TF-IDF] Found {len(results['indices'])} results, top score: {results['scores'][0]:.4f}")
         return results
@@ -249,41 +709,73 @@ def search_tfidf(query, category, top_k=20):
         print(f"[ERROR TF-IDF] {e}")
         import traceback
         traceback.print_exc()
-        return {"indices": [], "scores": [], "metadata": []}
+        return {"indices": [], "scores": [], "error": str(e)}
 
 # ============================================================
 # SBERT SEARCH
 # ============================================================
+def use_ann(index, n_searched=None):
+    """
+    Whether search_sbert should go through the ANN index.
+    n_searched: documents passing the category mask (default: whole corpus);
+    small categories are scored exactly, probing few lists would miss them.
+    """
+    if index.ann is None or SBERT_ANN_MODE == "exact":
+        return False
+    if n_searched is None:
+        n_searched = len(index.embeddings)
+    return SBERT_ANN_MODE == "ann" or n_searched >= ANN_MIN_DOCS
+
+def sbert_hits_many(index, query_vecs, mask, top_k):
+    """
+    Hits per row of an n x d matrix of unit-length query vectors, using the
+    configured SBERT scorer (ANN, quantized scan or exact). Shared by
+    search_sbert and search_many, so both return the same hits.
+    """
+    n_searched = None if mask is None else int(np.count_nonzero(mask))
+    if use_ann(index, n_searched):
+        # Approximate: exact scores for the documents in the n_probe nearest lists
+        results = []
+        for query_vec in query_vecs:
+            ids, scores = index.ann.search(
+                query_vec, index.embeddings, top_k, n_probe=SBERT_ANN_NPROBE, min_score=SBERT_MIN_SCORE, mask=mask
+            )
+            results.append(hits_from(ids, scores))
+        return results
+    
+    if index.quantized is not None:
+        # Quantized scan over all docs, float32 rescoring of the shortlist
+        results = []
+        for query_vec in query_vecs:
+            ids, scores = index.quantized.search(
+                query_vec, index.embeddings, top_k, min_score=SBERT_MIN_SCORE, mask=mask
+            )
+            results.append(hits_from(ids, scores))
+        return results
+    
+    # Calculate similarity for the whole batch (unit vectors -> dot product),
+    # then take the top results among the category's documents
+    scores = dense_scores(query_vecs, index.embeddings)
+    return [top_hits(row, SBERT_MIN_SCORE, top_k, mask) for row in scores]
+
 def search_sbert(query, category, top_k=20):
     """SBERT search with natural query"""
     try:
-        embeddings = np.load(f"embeddings/{category}_embeddings.npy")
-        metadata = load_metadata(category)
+        index = get_index()
+        mask = index.category_mask(category)
         model = get_sbert_model()
         
         print(f"[SBERT] Query: '{query}'")
         
-        # Encode query (natural, no preprocessing)
-        query_embedding = model.encode([query], convert_to_numpy=True)[0]
-        
-        # Calculate similarity
-        scores = cosine_similarity([query_embedding], embeddings)[0]
+        # Encode query (natural, no stemming) - cached on normalized text
+        query_embedding = EMBEDDING_CACHE.encode(model, SBERT_CACHE_NAME, query)
         
-        # Get top results
-        valid_idx = np.where(scores >= SBERT_MIN_SCORE)[0]
+        query_vec = l2_normalize_rows(np.atleast_2d(query_embedding))
+        results = sbert_hits_many(index, query_vec, mask, top_k)[0]
         
-        if len(valid_idx) == 0:
+        if not results["indices"]:
             print(f"[SBERT] No results found")
-            return {"indices": [], "scores": [], "metadata": []}
-        
-        # Sort by score
-        sorted_idx = valid_idx[np.argsort(scores[valid_idx])[::-1]][:top_k]
-        
-        results = {
-            "indices": [int(i) for i in sorted_idx],
-            "scores": [float(scores[i]) for i in sorted_idx],
-            "metadata": [metadata[i] for i in sorted_idx]
-        }
+            return results
         
         print(f"[SBERT] Found {len(results['indices'])} results, top score: {results['scores'][0]:.4f}")
         return results
@@ -292,98 +784,177 @@ def search_sbert(query, category, top_k=20):
         print(f"[ERROR SBERT] {e}")
         import traceback
         traceback.print_exc()
-        return {"indices": [], "scores": [], "metadata": []}
+        return {"indices": [], "scores": [], "error": str(e)}
+
+# ============================================================
+# HYBRID FUSION - WITH RELEVANCE FILTERING
+# ============================================================
+def fuse_results(query, category, tfidf_results, sbert_results, top_k=10, index=None):
+    """
+    Combine TF-IDF and SBERT hits, apply relevance boost/rejection, keep top_k.
+    index: CorpusIndex providing the positional index, cooking masks and
+    metadata (default: the resident corpus index). Branch hits carry only
+    ids and scores; metadata is read for the final top_k documents only.
+    """
+    if index is None:
+        index = get_index()
+    
+    # Combine results: doc id -> [tfidf_score, sbert_score]
+    score_map = {}
+    for idx, score in zip(tfidf_results["indices"], tfidf_results["scores"]):
+        score_map[idx] = [score, 0.0]
+    for idx, score in zip(sbert_results["indices"], sbert_results["scores"]):
+        score_map.setdefault(idx, [0.0, 0.0])[1] = score
+    
+    if not score_map:
+        return {"query": query, "category": category, "total_results": 0, "results": []}
+    
+    # Relevance for all candidates at once from the positional index.
+    # Cooking-method conflicts are rejected with one bitwise test; only non-phrase
+    # matches can conflict (a phrase match contains the query's method), so this
+    # is equivalent to the per-document check in relevance_from_features.
+    candidates = np.fromiter(score_map.keys(), dtype=np.int64, count=len(score_map))
+    relevance = relevance_scores(query, candidates, index.positional)
+    plan = COOKING_TABLE.query_plan(query_features(query).text)
+    if plan[0]:
+        relevance[COOKING_TABLE.conflicts_with(index.cooking_masks[candidates], plan)] = 0.0
+    
+    # Calculate final scores with relevance filtering
+    ranked = []
+    for (idx, (tfidf_score, sbert_score)), rel in zip(score_map.items(), relevance.tolist()):
+        # REJECT if relevance is too low
+        if rel < 0.1:
+            continue
+        
+        # Base combined score, boosted with relevance
+        base_score = TFIDF_WEIGHT * tfidf_score + SBERT_WEIGHT * sbert_score
+        ranked.append((base_score * (1 + rel), idx, tfidf_score, sbert_score, rel))
+    
+    # Sort by final score (stable: ties keep TF-IDF-then-SBERT order) and limit
+    ranked.sort(key=lambda x: x[0], reverse=True)
+    ranked = ranked[:top_k]
+    
+    # Metadata lookups only for the documents that are returned
+    final_results = []
+    for final_score, idx, tfidf_score, sbert_score, rel in ranked:
+        result_doc = dict(index.metadata[idx])
+        result_doc["index"] = int(idx)
+        result_doc["tfidf_score"] = float(tfidf_score)
+        result_doc["sbert_score"] = float(sbert_score)
+        result_doc["relevance_score"] = float(rel)
+        result_doc["combined_score"] = float(final_score)
+        final_results.append(result_doc)
+    
+    return {
+        "query": query,
+        "category": category,
+        "total_results": len(final_results),
+        "results": final_results
+    }
+
+# ============================================================
+# BRANCH EXECUTION - SEQUENTIAL OR CONCURRENT
+# ============================================================
+def _new_branch_executor():
+    return ThreadPoolExecutor(max_workers=max(2, SEARCH_THREADS), thread_name_prefix="search-branch")
+
+_BRANCH_EXECUTOR = _new_branch_executor()
+
+def reset_branch_executor():
+    """
+    Replace the branch thread pool; call in a forked worker, where the pool's
+    threads (started in the parent) do not exist
+    """
+    global _BRANCH_EXECUTOR
+    _BRANCH_EXECUTOR = _new_branch_executor()
+
+def run_branches(query, category):
+    """
+    Run the TF-IDF and SBERT branches, concurrently when SEARCH_CONCURRENT.
+    Each branch has its own deadline measured from submission; with
+    BRANCH_TIMEOUT_FALLBACK a late branch is replaced by empty hits flagged
+    with an error, so fusion proceeds on the other branch alone.
+    """
+    if not SEARCH_CONCURRENT:
+        return (
+            search_tfidf(query, category, top_k=CANDIDATES_PER_BRANCH),
+            search_sbert(query, category, top_k=CANDIDATES_PER_BRANCH),
+        )
+    
+    started = time.perf_counter()
+    branches = [
+        ("TF-IDF", _BRANCH_EXECUTOR.submit(search_tfidf, query, category, CANDIDATES_PER_BRANCH), TFIDF_TIMEOUT_S),
+        ("SBERT", _BRANCH_EXECUTOR.submit(search_sbert, query, category, CANDIDATES_PER_BRANCH), SBERT_TIMEOUT_S),
+    ]
+    
+    results = []
+    for name, future, timeout in branches:
+        wait = max(0.0, timeout - (time.perf_counter() - started)) if BRANCH_TIMEOUT_FALLBACK else None
+        try:
+            results.append(future.result(timeout=wait))
+        except FutureTimeout:
+            print(f"[WARN] {name} branch missed its {timeout:.1f}s deadline, using single-branch results")
+            results.append({"indices": [], "scores": [], "error": "timeout"})
+    
+    return results[0], results[1]
 
 # ============================================================
-# MAIN SEARCH - WITH RELEVANCE FILTERING
+# MAIN SEARCH
 # ============================================================
-def search(query, category, top_k=10):
+def scoring_config():
+    """Everything besides the query that changes search() output"""
+    return (TFIDF_MIN_SCORE, SBERT_MIN_SCORE, TFIDF_WEIGHT, SBERT_WEIGHT, CANDIDATES_PER_BRANCH, SBERT_CACHE_NAME)
+
+def _copy_result(result, query):
+    """Shallow per-document copy so callers can't mutate a cached response"""
+    copied = dict(result)
+    copied["query"] = query
+    copied["results"] = [dict(doc) for doc in result["results"]]
+    return copied
+
+def _result_cache_key(query, category, top_k):
+    return (normalize_query(query), resolve_categories(category), int(top_k), scoring_config())
+
+def search(query, category, top_k=10, use_cache=True):
     """
     Main search with hybrid scoring and relevance filtering
+    Responses are cached per (normalized query, category, top_k, scoring config)
+    and tagged with the index version, so a rebuilt index never serves stale hits.
+    Raises ValueError for an unknown category before any work is done.
     """
+    resolve_categories(category)
+    
     try:
         print(f"\n{'='*80}")
         print(f"SEARCH: '{query}' in category '{category}'")
         print(f"{'='*80}")
         
+        index = get_index()
+        
+        cache_key = None
+        if use_cache and RESULT_CACHE_ENABLED:
+            cache_key = _result_cache_key(query, category, top_k)
+            cached = RESULT_CACHE.lookup(cache_key, index.version)
+            if cached is not None:
+                print(f"[CACHE] Hit for '{query}' in '{category}'")
+                return _copy_result(cached, query)
+        
         # Get results from both methods
-        tfidf_results = search_tfidf(query, category, top_k=30)
-        sbert_results = search_sbert(query, category, top_k=30)
-        
-        # Combine results
-        score_map = {}
-        
-        # Add TF-IDF scores
-        for i, idx in enumerate(tfidf_results["indices"]):
-            score_map[idx] = {
-                "tfidf_score": tfidf_results["scores"][i],
-                "sbert_score": 0.0,
-                "metadata": tfidf_results["metadata"][i]
-            }
-        
-        # Add SBERT scores
-        for i, idx in enumerate(sbert_results["indices"]):
-            if idx not in score_map:
-                score_map[idx] = {
-                    "tfidf_score": 0.0,
-                    "sbert_score": 0.0,
-                    "metadata": sbert_results["metadata"][i]
-                }
-            score_map[idx]["sbert_score"] = sbert_results["scores"][i]
-            if score_map[idx]["metadata"] is None:
-                score_map[idx]["metadata"] = sbert_results["metadata"][i]
-        
-        # Calculate final scores with relevance filtering
-        final_results = []
-        
-        for idx, item in score_map.items():
-            doc = item["metadata"]
-            if doc is None:
-                continue
-            
-            # Calculate relevance score
-            relevance = calculate_relevance_score(query, doc)
-            
-            # REJECT if relevance is too low
-            if relevance < 0.1:
-                continue
-            
-            # Calculate base combined score
-            base_score = (
-                TFIDF_WEIGHT * item["tfidf_score"] + 
-                SBERT_WEIGHT * item["sbert_score"]
-            )
-            
-            # Boost with relevance
-            final_score = base_score * (1 + relevance)
-            
-            # Build result
-            result_doc = doc.copy()
-            result_doc["index"] = int(idx)
-            result_doc["tfidf_score"] = float(item["tfidf_score"])
-            result_doc["sbert_score"] = float(item["sbert_score"])
-            result_doc["relevance_score"] = float(relevance)
-            result_doc["combined_score"] = float(final_score)
-            
-            final_results.append(result_doc)
+        tfidf_results, sbert_results = run_branches(query, category)
         
-        # Sort by final score
-        final_results.sort(key=lambda x: x["combined_score"], reverse=True)
+        result = fuse_results(query, category, tfidf_results, sbert_results, top_k, index)
         
-        # Limit results
-        final_results = final_results[:top_k]
+        print(f"\n[FINAL] Found {result['total_results']} relevant results")
+        if result["results"]:
+            print(f"[FINAL] Top result: {result['results'][0].get('Judul', 'N/A')}")
+            print(f"[FINAL] Top score: {result['results'][0]['combined_score']:.4f}")
         
-        print(f"\n[FINAL] Found {len(final_results)} relevant results")
-        if final_results:
-            print(f"[FINAL] Top result: {final_results[0].get('Judul', 'N/A')}")
-            print(f"[FINAL] Top score: {final_results[0]['combined_score']:.4f}")
+        # Don't cache degraded responses (a branch failed)
+        if cache_key is not None and "error" not in tfidf_results and "error" not in sbert_results:
+            RESULT_CACHE.store(cache_key, index.version, result)
+            return _copy_result(result, query)
         
-        return {
-            "query": query,
-            "category": category,
-            "total_results": len(final_results),
-            "results": final_results
-        }
+        return result
         
     except Exception as e:
         print(f"[ERROR] Search failed: {e}")
@@ -396,6 +967,71 @@ def search(query, category, top_k=10):
             "results": []
         }
 
+# ============================================================
+# BATCH SEARCH - ONE TRANSFORM, ONE ENCODE PER BATCH
+# ============================================================
+def search_many(queries, category, top_k=10, use_cache=True):
+    """
+    Batched search() for offline jobs and /search/batch.
+    All cache misses share one vectorizer.transform and one SBERT encode
+    batch; scoring goes through the same scorers as search() (one product
+    per batch on the exhaustive paths), fusion stays per query.
+    Returns one search()-shaped response per query, in input order.
+    Raises ValueError for an unknown category before any work is done.
+    """
+    queries = list(queries)
+    responses = [None] * len(queries)
+    resolve_categories(category)
+    
+    try:
+        index = get_index()
+        mask = index.category_mask(category)
+        
+        # Serve what we can from the result cache
+        pending = []
+        for i, query in enumerate(queries):
+            if use_cache and RESULT_CACHE_ENABLED:
+                cached = RESULT_CACHE.lookup(_result_cache_key(query, category, top_k), index.version)
+                if cached is not None:
+                    responses[i] = _copy_result(cached, query)
+                    continue
+            pending.append(i)
+        
+        print(f"[BATCH] {len(queries)} queries in '{category}', {len(queries) - len(pending)} cached")
+        if not pending:
+            return responses
+        
+        batch = [queries[i] for i in pending]
+        
+        # TF-IDF: one transform for the whole batch
+        q_vecs = index.vectorizer.transform([minimal_preprocess(q) for q in batch])
+        tfidf_batch = tfidf_hits_many(index, q_vecs, mask, CANDIDATES_PER_BRANCH)
+        
+        # SBERT: one encode batch (cache misses only)
+        model = get_sbert_model()
+        q_embs = l2_normalize_rows(np.vstack(EMBEDDING_CACHE.encode_many(model, SBERT_CACHE_NAME, batch)))
+        sbert_batch = sbert_hits_many(index, q_embs, mask, CANDIDATES_PER_BRANCH)
+        
+        for row, i in enumerate(pending):
+            query = queries[i]
+            result = fuse_results(query, category, tfidf_batch[row], sbert_batch[row], top_k, index)
+            
+            if use_cache and RESULT_CACHE_ENABLED:
+                RESULT_CACHE.store(_result_cache_key(query, category, top_k), index.version, result)
+                result = _copy_result(result, query)
+            responses[i] = result
+        
+        return responses
+        
+    except Exception as e:
+        print(f"[ERROR] Batch search failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return [
+            responses[i] or {"query": q, "category": category, "total_results": 0, "results": []}
+            for i, q in enumerate(queries)
+        ]
+
 # ============================================================
 # HELPER - PRINT RESULTS
 # ============================================================
@@ -424,6 +1060,7 @@ if __name__ == "__main__":
         ("ayam goreng", "makanan"),
         ("resep soto ayam", "makanan"),
         ("jus segar", "minuman"),
+        ("es jeruk", "makanan,minuman"),
     ]
     
     for query, category in test_queries:
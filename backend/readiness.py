@@ -0,0 +1,63 @@
+"""
+Startup readiness tracking untuk TasteFind backend.
+
+Setiap komponen (index, model SBERT, warm-up query, evaluation cache)
+dimuat lewat Readiness.run(), yang mencatat state dan lama loading-nya.
+/ready di app.py mengembalikan 200 hanya jika semua komponen `required`
+sudah ready, sehingga load balancer bisa menahan instance baru sampai
+latency-nya sudah steady-state.
+"""
+
+import threading
+import time
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+class Readiness:
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def register(self, name, required=True):
+        with self._lock:
+            self._components.setdefault(name, {
+                "state": PENDING,
+                "required": required,
+                "load_time_s": None,
+                "error": None,
+            })
+
+    def run(self, name, fn, required=True):
+        """Run one loading step, recording its state and duration; returns fn() or None on failure"""
+        self.register(name, required)
+        self._update(name, state=LOADING, error=None)
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self._update(name, state=FAILED, load_time_s=round(time.perf_counter() - started, 3), error=str(e))
+            print(f"[WARN] Startup step '{name}' failed: {e}")
+            return None
+
+        self._update(name, state=READY, load_time_s=round(time.perf_counter() - started, 3))
+        print(f"[INFO] ✓ {name} ready in {time.perf_counter() - started:.2f}s")
+        return result
+
+    def _update(self, name, **fields):
+        with self._lock:
+            self._components[name].update(fields)
+
+    def is_ready(self):
+        with self._lock:
+            required = [c for c in self._components.values() if c["required"]]
+            return bool(required) and all(c["state"] == READY for c in required)
+
+    def snapshot(self):
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        return {
+            "ready": self.is_ready(),
+            "uptime_s": round(time.time() - self._started, 3),
+            "components": components,
+        }
@@ -0,0 +1,296 @@
+"""
+SBERT query encoder backends untuk query_engine.
+
+torch : SentenceTransformer biasa (default)
+onnx  : model di-export sekali ke ONNX (opsional dynamic int8 quantization)
+        dan dijalankan lewat onnxruntime di CPU. Query-time hanya butuh
+        onnxruntime + tokenizers, tanpa import torch / sentence_transformers.
+stub  : hashed bag-of-words (tanpa model), untuk scaling test offline
+        (synthetic.py); BUKAN untuk relevansi.
+
+Kedua backend punya interface encode(texts, convert_to_numpy=True) yang sama
+(mean pooling, belum dinormalisasi), jadi EMBEDDING_CACHE dan query_engine
+tidak perlu tahu backend mana yang aktif.
+
+Export   :  python sbert_backend.py export [--int8]
+Parity   :  python sbert_backend.py parity [--int8]
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+SBERT_BACKENDS = ("torch", "onnx", "stub")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ONNX_DIR = os.environ.get("TASTEFIND_ONNX_DIR", os.path.join(BASE_DIR, "models", "onnx"))
+ONNX_THREADS = int(os.environ.get("TASTEFIND_ONNX_THREADS", "1"))  # per session; workers scale out
+STUB_DIMENSION = 384  # same as paraphrase-multilingual-MiniLM-L12-v2
+
+# Minimum cosine between torch and ONNX embeddings of the same text, and minimum
+# mean top-k overlap of their rankings over the same (torch-encoded) documents
+PARITY_MIN_COSINE = {"fp32": 0.9999, "int8": 0.99}
+PARITY_MIN_TOPK_OVERLAP = {"fp32": 0.95, "int8": 0.8}
+PARITY_TOP_K = 10
+
+def onnx_model_dir(model_name):
+    return os.path.join(ONNX_DIR, model_name.replace("/", "__"))
+
+def onnx_model_file(quantized):
+    return "model_int8.onnx" if quantized else "model.onnx"
+
+# ============================================================
+# ONNX ENCODER
+# ============================================================
+class OnnxEncoder:
+    """
+    Transformer forward pass in onnxruntime + the model's pooling (mean over
+    attention mask), matching SentenceTransformer.encode for this model.
+    """
+    def __init__(self, model_dir, quantized=False, threads=ONNX_THREADS):
+        if ort is None or Tokenizer is None:
+            raise ImportError("ONNX backend needs onnxruntime and tokenizers installed")
+
+        with open(os.path.join(model_dir, "encoder.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        if self.config.get("pooling") != "mean":
+            raise ValueError(f"Unsupported pooling: {self.config.get('pooling')}")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, onnx_model_file(quantized)), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, feeds)[0]
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            chunks.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(chunks) if chunks else np.empty((0, self.config["dimension"]), np.float32)
+        return embeddings[0] if single else embeddings
+
+# ============================================================
+# STUB ENCODER
+# ============================================================
+class HashingEncoder:
+    """
+    Deterministic stand-in for the SBERT model: token counts hashed into
+    STUB_DIMENSION signed buckets. Same encode() interface and output shape,
+    no download and no torch, so the pipeline can be exercised offline.
+    """
+    def __init__(self, dimension=STUB_DIMENSION):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.vectorizer = HashingVectorizer(n_features=dimension, alternate_sign=True, norm=None)
+        self.dimension = dimension
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = self.vectorizer.transform(texts).toarray().astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+# ============================================================
+# EXPORT (build time: needs torch + sentence_transformers)
+# ============================================================
+def export_onnx(model_name, quantize=False, model_dir=None):
+    """Export the cached SentenceTransformer's transformer to ONNX (+ dynamic int8 copy)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model_dir = model_dir or onnx_model_dir(model_name)
+    os.makedirs(model_dir, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    pooling = st_model[1]
+    # pooling_mode (sentence-transformers >= 5) / pooling_mode_mean_tokens (older)
+    if getattr(pooling, "pooling_mode", None) != "mean" and not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError(f"{model_name} does not use mean pooling")
+
+    hf_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(model_dir)
+
+    dummy = tokenizer(["contoh kalimat"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "tokens"}
+
+    onnx_path = os.path.join(model_dir, onnx_model_file(False))
+    with torch.no_grad():
+        torch.onnx.export(
+            hf_model,
+            tuple(dummy[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, os.path.join(model_dir, onnx_model_file(True)), weight_type=QuantType.QInt8)
+
+    with open(os.path.join(model_dir, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "pooling": "mean",
+            "max_seq_length": int(st_model.max_seq_length),
+            "pad_token_id": int(tokenizer.pad_token_id),
+            "pad_token": tokenizer.pad_token,
+            "dimension": int(st_model.encode(["contoh"]).shape[1]),
+        }, f, indent=2)
+
+    print(f"✓ Exported {model_name} -> {onnx_path}" + (" (+ int8)" if quantize else ""))
+    return model_dir
+
+# ============================================================
+# LOADING
+# ============================================================
+def load_encoder(model_name, backend="torch", quantized=False):
+    """Encoder for query_engine; the torch import only happens for the torch backend"""
+    if backend not in SBERT_BACKENDS:
+        raise ValueError(f"Unknown SBERT backend: {backend}")
+    if backend == "onnx":
+        return OnnxEncoder(onnx_model_dir(model_name), quantized=quantized)
+    if backend == "stub":
+        return HashingEncoder()
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def cache_name(model_name, backend="torch", quantized=False):
+    """EMBEDDING_CACHE key prefix: backends give (slightly) different vectors"""
+    if backend == "torch":
+        return model_name
+    return f"{model_name}@{backend}" + ("-int8" if quantized else "")
+
+# ============================================================
+# PARITY CHECK: torch vs onnx
+# ============================================================
+PARITY_TEXTS = [
+    "ayam goreng", "resep soto ayam", "jus segar", "kopi susu gula aren", "ikan bakar",
+    "sayur bening bayam", "minuman hangat untuk musim hujan", "kue coklat tanpa oven",
+    "makanan sehat untuk diet", "berita kuliner terbaru", "nasi goreng kampung pedas",
+    "es jeruk", "sup", "resep rendang daging sapi empuk dan bumbu meresap",
+]
+
+def _rss_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return float("nan")
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+def topk_overlap(reference_queries, candidate_queries, doc_vectors, k=PARITY_TOP_K):
+    """Mean |top-k(reference) & top-k(candidate)| / k, both ranked by cosine over the same documents"""
+    docs = _unit(doc_vectors)
+    k = min(k, len(docs))
+    ref = np.argsort(-(_unit(reference_queries) @ docs.T), axis=1)[:, :k]
+    cand = np.argsort(-(_unit(candidate_queries) @ docs.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref, cand)]))
+
+def parity_report(model_name, quantized=False, texts=PARITY_TEXTS, repeat=20, docs=None):
+    """
+    Cosine agreement, per-query latency, import+load time and peak RSS of both
+    backends. ONNX runs first, so its peak RSS is taken before torch is imported.
+    docs: corpus texts (encoded with torch) to compare both backends' top-k rankings on.
+    """
+    started = time.perf_counter()
+    encoder = load_encoder(model_name, "onnx", quantized)
+    onnx_load = time.perf_counter() - started
+    onnx_vecs = encoder.encode(texts)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            encoder.encode([text])
+    onnx_latency = (time.perf_counter() - started) / (repeat * len(texts))
+    onnx_rss = _rss_mb()
+
+    started = time.perf_counter()
+    torch_model = load_encoder(model_name, "torch")
+    torch_load = time.perf_counter() - started
+    torch_vecs = torch_model.encode(texts, convert_to_numpy=True)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            torch_model.encode([text], convert_to_numpy=True)
+    torch_latency = (time.perf_counter() - started) / (repeat * len(texts))
+
+    cosines = (_unit(onnx_vecs) * _unit(torch_vecs)).sum(axis=1)
+    precision = "int8" if quantized else "fp32"
+    threshold = PARITY_MIN_COSINE[precision]
+    passed = bool(cosines.min() >= threshold)
+
+    overlap = None
+    if docs:
+        overlap = topk_overlap(torch_vecs, onnx_vecs, torch_model.encode(list(docs), convert_to_numpy=True))
+        passed = passed and overlap >= PARITY_MIN_TOPK_OVERLAP[precision]
+
+    return {
+        "model": model_name,
+        "quantized": quantized,
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "threshold": threshold,
+        "topk_overlap": overlap,
+        "topk_overlap_threshold": PARITY_MIN_TOPK_OVERLAP[precision],
+        "passed": passed,
+        "onnx": {"load_s": onnx_load, "latency_ms": onnx_latency * 1000, "peak_rss_mb": onnx_rss},
+        "torch": {"load_s": torch_load, "latency_ms": torch_latency * 1000, "peak_rss_mb": _rss_mb()},
+    }
+
+if __name__ == "__main__":
+    from query_engine import SBERT_MODEL_NAME, CORPUS, open_metadata
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "parity"
+    int8 = "--int8" in sys.argv
+
+    if command == "export":
+        export_onnx(SBERT_MODEL_NAME, quantize=int8)
+    elif command == "parity":
+        docs = [f"{doc.get('Judul', '')}. {doc.get('Deskripsi', '')}" for doc in open_metadata(CORPUS)]
+        report = parity_report(SBERT_MODEL_NAME, quantized=int8, docs=docs)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["passed"] else 1)
+    else:
+        print(f"Usage: python sbert_backend.py [export|parity] [--int8]")
+        sys.exit(2)
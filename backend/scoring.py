@@ -0,0 +1,64 @@
+"""
+Vector scoring helpers shared by query_engine dan evaluate.
+
+Semua matriks korpus (TF-IDF dan SBERT) disimpan sudah L2-normalized
+float32, jadi cosine similarity = dot product biasa, dan top-k diambil
+dengan np.argpartition (O(N)) lalu hanya k pemenang yang di-sort.
+"""
+
+import numpy as np
+
+# ============================================================
+# NORMALIZATION
+# ============================================================
+def l2_normalize_rows(matrix):
+    """Return a float32 copy of a dense matrix with unit-length rows (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+def is_l2_normalized(matrix, atol=1e-3):
+    """True if every non-zero row already has unit length"""
+    norms = np.linalg.norm(np.asarray(matrix), axis=-1)
+    norms = norms[norms > 0]
+    return bool(np.all(np.abs(norms - 1.0) <= atol))
+
+# ============================================================
+# SCORING
+# ============================================================
+def dense_scores(query_vecs, matrix):
+    """
+    Cosine scores for unit-length query vector(s) against a unit-row matrix.
+    1-D query -> 1-D scores, 2-D queries -> (n_queries, n_docs)
+    """
+    return np.asarray(query_vecs, dtype=np.float32) @ matrix.T
+
+def sparse_scores(query_vecs, matrix):
+    """Cosine scores for L2-normalized sparse query rows against an L2-normalized CSR matrix"""
+    scores = (matrix @ query_vecs.T).T
+    return np.asarray(scores.toarray() if hasattr(scores, "toarray") else scores)
+
+# ============================================================
+# TOP-K SELECTION
+# ============================================================
+def top_k_indices(scores, top_k, min_score=None, mask=None):
+    """
+    Indices of the top_k scores (best first), optionally only scores >= min_score
+    and only positions where the boolean mask is True.
+    Uses argpartition so only the k winners are sorted.
+    """
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    keep = mask
+    if min_score is not None:
+        keep = scores >= min_score if keep is None else keep & (scores >= min_score)
+    candidates = np.arange(len(scores)) if keep is None else np.flatnonzero(keep)
+
+    if len(candidates) > top_k:
+        part = np.argpartition(scores[candidates], -top_k)[-top_k:]
+        candidates = candidates[part]
+
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order]
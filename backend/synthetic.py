@@ -0,0 +1,294 @@
+"""
+Generator korpus sintetis untuk scaling test pipeline TasteFind.
+
+Dokumen resep (makanan / minuman / sehat) dan berita dibuat dengan schema
+yang sama seperti data/semua.json (Judul, Tanggal, Deskripsi, URL Gambar,
+URL Link, Kategori, Bahan + Langkah atau Isi Berita). Isi setiap field
+disusun dari potongan pendek (CHUNK_TOKENS kata) yang diambil acak dari
+teks asli field + kategori yang sama, dengan jumlah segmen dan panjang
+segmen mengikuti distribusi korpus asli. Distribusi unigram (dan sebagian
+besar bigram) jadi sama dengan korpus asli, hanya jumlah dokumennya yang
+berbeda.
+
+Setiap ukuran dibangun di synthetic/<n_docs>/ lalu pipeline dijalankan
+sebagai subprocess di direktori itu:
+  preprocessing.py -> train_tfidf.py -> train_sbert.py -> benchmark.py
+(query_engine membaca artefak lewat TASTEFIND_DATA_DIR). Per tahap dicatat
+waktu build dan peak RSS, lalu ukuran index per direktori dan latency query.
+
+Run      :  python synthetic.py --sizes 10000,100000,1000000 --stub-encoder
+Generate :  python synthetic.py --sizes 10000 --generate-only
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from metadata_store import document_category
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(BASE_DIR, "data", "semua.json")
+SYNTHETIC_DIR = os.environ.get("TASTEFIND_SYNTHETIC_DIR", os.path.join(BASE_DIR, "synthetic"))
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+CHUNK_TOKENS = 4     # panjang potongan teks asli yang disalin (menjaga bigram lokal)
+BATCH_DOCS = 10_000  # dokumen per batch generate (memory tetap konstan untuk 1M docs)
+
+# Field output -> (field di data/semua.json, separator antar segmen atau None)
+RECIPE_FIELDS = {"Bahan": ("Bahan", " | "), "Langkah": ("Langkah", " | ")}
+BERITA_FIELDS = {"Isi Berita": ("Isi", " ||| ")}
+COMMON_FIELDS = {"Judul": ("Judul", None), "Deskripsi": ("Deskripsi", None)}
+
+BENCH_TARGETS = "search_tfidf,search_sbert,search"
+ARTIFACT_DIRS = ("dataset", "metadata", "tokens", "tfidf", "embeddings")
+
+# ============================================================
+# CORPUS MODEL
+# ============================================================
+class FieldModel:
+    """Token stream + empirical segment counts / lengths of one field in one category"""
+
+    def __init__(self, stream, segment_counts, segment_lengths, separator):
+        self.stream = stream
+        self.segment_counts = segment_counts
+        self.segment_lengths = segment_lengths
+        self.separator = separator
+
+    @classmethod
+    def fit(cls, texts, separator, vocab):
+        stream, counts, lengths = [], [], []
+        for text in texts:
+            segments = [text] if separator is None else text.split(separator.strip())
+            segments = [seg.split() for seg in segments]
+            segments = [seg for seg in segments if seg]
+            counts.append(len(segments))
+            for seg in segments:
+                lengths.append(len(seg))
+                stream.extend(vocab.setdefault(tok, len(vocab)) for tok in seg)
+
+        # Pad so every chunk start has CHUNK_TOKENS tokens behind it
+        stream = np.array(stream or [vocab.setdefault("", len(vocab))], dtype=np.int32)
+        stream = np.concatenate([stream, stream[:CHUNK_TOKENS]])
+        return cls(stream, np.array(counts or [0]), np.array(lengths or [1]), separator)
+
+    def sample(self, n_docs, rng, words):
+        """n_docs texts: per doc a sampled number of segments, each of a sampled length"""
+        counts = rng.choice(self.segment_counts, n_docs)
+        lengths = rng.choice(self.segment_lengths, int(counts.sum()))
+        n_chunks = -(-lengths // CHUNK_TOKENS)
+        starts = rng.integers(0, len(self.stream) - CHUNK_TOKENS, int(n_chunks.sum()))
+        tokens = words[self.stream[(starts[:, None] + np.arange(CHUNK_TOKENS)).ravel()]]
+
+        offsets = np.concatenate([[0], np.cumsum(n_chunks)]) * CHUNK_TOKENS
+        segments = [" ".join(tokens[o:o + n]) for o, n in zip(offsets[:-1], lengths)]
+
+        separator = self.separator or " "
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        return [separator.join(segments[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+class CorpusModel:
+    """Per-category field models, category mix and pools of the non-text fields"""
+
+    def __init__(self, words, categories, weights, fields, pools):
+        self.words = words
+        self.categories = categories
+        self.weights = weights
+        self.fields = fields
+        self.pools = pools
+
+    @classmethod
+    def fit(cls, docs):
+        vocab = {}
+        by_category = {}
+        for doc in docs:
+            by_category.setdefault(document_category(doc), []).append(doc)
+        by_category.pop("", None)
+
+        categories = sorted(by_category)
+        fields, pools = {}, {}
+        for cat in categories:
+            items = by_category[cat]
+            spec = {**COMMON_FIELDS, **(BERITA_FIELDS if cat == "berita" else RECIPE_FIELDS)}
+            fields[cat] = {
+                name: FieldModel.fit([str(item.get(source) or "") for item in items], separator, vocab)
+                for name, (source, separator) in spec.items()
+            }
+            pools[cat] = {key: [item.get(key, "") for item in items] for key in ("Tanggal", "URL Gambar", "URL Link")}
+
+        words = np.empty(len(vocab), dtype=object)
+        for tok, i in vocab.items():
+            words[i] = tok
+        counts = np.array([len(by_category[cat]) for cat in categories], dtype=np.float64)
+        return cls(words, categories, counts / counts.sum(), fields, pools)
+
+    @classmethod
+    def from_source(cls, path=SOURCE_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.fit(json.load(f))
+
+    def generate(self, n_docs, seed=0, batch_size=BATCH_DOCS):
+        """Yield n_docs synthetic documents, batch by batch"""
+        rng = np.random.default_rng(seed)
+        doc_id = 0
+        while doc_id < n_docs:
+            batch = min(batch_size, n_docs - doc_id)
+            cats = rng.choice(len(self.categories), batch, p=self.weights)
+            columns = {}
+            for c, cat in enumerate(self.categories):
+                m = int((cats == c).sum())
+                columns[c] = {name: iter(model.sample(m, rng, self.words)) for name, model in self.fields[cat].items()}
+
+            for c in cats:
+                cat = self.categories[c]
+                pool = self.pools[cat]
+                pick = rng.integers(len(pool["Tanggal"]))
+                text = {name: next(values) for name, values in columns[c].items()}
+                doc = {
+                    "Judul": text.pop("Judul"),
+                    "Tanggal": pool["Tanggal"][pick],
+                    "Deskripsi": text.pop("Deskripsi"),
+                    "URL Gambar": pool["URL Gambar"][pick],
+                    "URL Link": f"{pool['URL Link'][pick]}#synthetic-{doc_id}",
+                    "Kategori": cat,
+                }
+                doc.update(text)
+                yield doc
+                doc_id += 1
+
+def write_dataset(docs, path):
+    """Stream documents into a JSON array (never holds the whole corpus in memory)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for doc in docs:
+            if n:
+                f.write(",\n")
+            f.write(json.dumps(doc, ensure_ascii=False))
+            n += 1
+        f.write("\n]\n")
+    return n
+
+# ============================================================
+# PIPELINE
+# ============================================================
+def run_stage(cmd, cwd, env, log_path):
+    """Run one pipeline script; wall time, peak RSS of that process and exit code"""
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss_mb = usage.ru_maxrss / 1024
+        else:  # Windows: no per-child rusage
+            proc.wait()
+            peak_rss_mb = None
+    return {"seconds": time.perf_counter() - started, "peak_rss_mb": peak_rss_mb, "returncode": proc.returncode}
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def query_latency(bench_path):
+    """Cold / warm percentiles per target from a benchmark.py report"""
+    with open(bench_path, "r", encoding="utf-8") as f:
+        bench = json.load(f)
+    latency = {"startup": bench["startup"]}
+    for name, result in bench["targets"].items():
+        latency[name] = {
+            "cold": result["cold"],
+            "warm": result["warm"],
+            "qps": {str(t["clients"]): t["qps"] for t in result["throughput"]},
+        }
+    return latency
+
+def build_corpus(model, n_docs, workdir, seed=0, stub_encoder=False, generate_only=False, bench_args=()):
+    """Generate n_docs documents in workdir and drive the full pipeline over them"""
+    script = lambda name: os.path.join(BASE_DIR, name)
+    result = {"docs": n_docs, "workdir": workdir, "stages": {}}
+
+    started = time.perf_counter()
+    write_dataset(model.generate(n_docs, seed=seed), os.path.join(workdir, "dataset", "semua.json"))
+    result["stages"]["generate"] = {"seconds": time.perf_counter() - started}
+    print(f"[INFO] {n_docs} docs generated in {result['stages']['generate']['seconds']:.1f}s")
+    if generate_only:
+        return result
+
+    env = {**os.environ, "TASTEFIND_DATA_DIR": workdir, "PYTHONUNBUFFERED": "1"}
+    if stub_encoder:
+        env["TASTEFIND_SBERT_BACKEND"] = "stub"
+    bench_path = os.path.join(workdir, "benchmark.json")
+    stages = [
+        ("preprocess", [sys.executable, script("preprocessing.py"), "semua.json", "semua"]),
+        ("train_tfidf", [sys.executable, script("train_tfidf.py")]),
+        ("train_sbert", [sys.executable, script("train_sbert.py")]),
+        ("query", [sys.executable, script("benchmark.py"), "--targets", BENCH_TARGETS,
+                   "--output", bench_path, *bench_args]),
+    ]
+
+    os.makedirs(os.path.join(workdir, "logs"), exist_ok=True)
+    for name, cmd in stages:
+        log_path = os.path.join(workdir, "logs", f"{name}.log")
+        stage = run_stage(cmd, workdir, env, log_path)
+        result["stages"][name] = stage
+        print(f"[INFO] {n_docs} docs: {name} {stage['seconds']:.1f}s (exit {stage['returncode']})")
+        if stage["returncode"] != 0:
+            print(f"[ERROR] {name} failed, see {log_path}")
+            result["failed"] = name
+            break
+
+    result["sizes_mb"] = {d: dir_size(os.path.join(workdir, d)) / 2**20 for d in ARTIFACT_DIRS}
+    if "failed" not in result:
+        result["latency"] = query_latency(bench_path)
+    return result
+
+def summary_lines(results):
+    lines = [f"{'docs':>9} {'prep s':>8} {'tfidf s':>8} {'sbert s':>8} {'index MB':>9} "
+             f"{'tfidf p50':>10} {'sbert p50':>10} {'search p50':>11} {'search p99':>11}"]
+    for r in results:
+        stages = r["stages"]
+        secs = [stages.get(s, {}).get("seconds") for s in ("preprocess", "train_tfidf", "train_sbert")]
+        index_mb = sum(r.get("sizes_mb", {}).get(d, 0.0) for d in ("metadata", "tfidf", "embeddings"))
+        cold = {name: r.get("latency", {}).get(name, {}).get("cold", {}) for name in BENCH_TARGETS.split(",")}
+        fmt = lambda v, w: f"{v:>{w}.2f}" if v is not None else f"{'-':>{w}}"
+        lines.append(
+            f"{r['docs']:>9} {fmt(secs[0], 8)} {fmt(secs[1], 8)} {fmt(secs[2], 8)} {index_mb:>9.1f} "
+            f"{fmt(cold['search_tfidf'].get('p50_ms'), 10)} {fmt(cold['search_sbert'].get('p50_ms'), 10)} "
+            f"{fmt(cold['search'].get('p50_ms'), 11)} {fmt(cold['search'].get('p99_ms'), 11)}"
+        )
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic corpus scaling test")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-encoder", action="store_true", help="hashed bag-of-words encoder instead of SBERT")
+    parser.add_argument("--generate-only", action="store_true")
+    parser.add_argument("--repeat", default="3", help="benchmark.py --repeat")
+    parser.add_argument("--output", default=os.path.join(SYNTHETIC_DIR, "report.json"))
+    args = parser.parse_args()
+
+    model = CorpusModel.from_source()
+    print(f"[INFO] Corpus model: {len(model.words)} distinct tokens, categories {model.categories}")
+
+    bench_args = ("--repeat", args.repeat, "--clients", "1,4", "--requests-per-client", "20")
+    results = []
+    for n_docs in [int(n) for n in args.sizes.split(",")]:
+        workdir = os.path.join(SYNTHETIC_DIR, str(n_docs))
+        results.append(build_corpus(model, n_docs, workdir, args.seed, args.stub_encoder, args.generate_only, bench_args))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"seed": args.seed, "stub_encoder": args.stub_encoder, "results": results}, f, indent=2)
+
+    if not args.generate_only:
+        print("\n".join(summary_lines(results)))
+    print(f"✓ Saved {args.output}")
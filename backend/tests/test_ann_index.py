@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from ann_index import IVFFlatIndex
+from scoring import l2_normalize_rows, top_k_indices
+
+N_DOCS, DIM, TOP_K = 4000, 32, 10
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(3)
+    centers = l2_normalize_rows(rng.standard_normal((40, DIM)))
+    topic = rng.integers(len(centers), size=N_DOCS)
+    embeddings = l2_normalize_rows(centers[topic] + 0.35 * rng.standard_normal((N_DOCS, DIM)))
+    return embeddings, topic, IVFFlatIndex.build(embeddings, n_lists=64)
+
+def recall(index, embeddings, queries, mask):
+    hits = 0
+    for q in queries:
+        ids, _ = index.search(q, embeddings, TOP_K, mask=mask)
+        assert len(ids) == TOP_K
+        assert mask is None or mask[ids].all()
+        truth = top_k_indices(embeddings @ q, TOP_K, mask=mask)
+        hits += len(set(ids.tolist()) & set(truth.tolist()))
+    return hits / (TOP_K * len(queries))
+
+@pytest.mark.parametrize("selectivity", [0.5, 0.2, 0.05, 0.01])
+def test_masked_recall_random_category(corpus, selectivity):
+    embeddings, _, index = corpus
+    rng = np.random.default_rng(int(selectivity * 100))
+    mask = rng.random(N_DOCS) < selectivity
+    queries = l2_normalize_rows(embeddings[rng.choice(N_DOCS, 50)] + 0.05 * rng.standard_normal((50, DIM)))
+    unmasked = recall(index, embeddings, queries, None)
+    assert recall(index, embeddings, queries, mask) >= min(unmasked, 0.95) - 0.05
+
+def test_masked_category_away_from_query(corpus):
+    # Category documents live in topics the query is not near: the probed
+    # lists hold none of them, yet the top_k of the category must come back
+    embeddings, topic, index = corpus
+    mask = np.isin(topic, [0, 1])
+    queries = embeddings[np.flatnonzero(~np.isin(topic, [0, 1, 2, 3]))[:20]]
+    assert recall(index, embeddings, queries, mask) == 1.0
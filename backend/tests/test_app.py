@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+import app as app_module
+from app import create_app
+from readiness import Readiness
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+def test_search_rejects_unknown_category(client):
+    response = client.post("/search", json={"query": "ayam goreng", "category": "pizza"})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert "pizza" in body["error"] and body["results"] == []
+
+def test_batch_rejects_unknown_category(client):
+    response = client.post("/search/batch", json={"queries": ["ayam goreng"], "category": "pizza"})
+    assert response.status_code == 400
+
+@pytest.fixture
+def warmup_steps(monkeypatch):
+    """Fresh readiness state; the SBERT step blocks until released"""
+    readiness = Readiness()
+    for name in ("indexes", "sbert_model", "warmup_queries"):
+        readiness.register(name)
+    readiness.register("evaluation", required=False)
+    monkeypatch.setattr(app_module, "READINESS", readiness)
+
+    release = threading.Event()
+    monkeypatch.setattr(app_module.INDEX_REGISTRY, "load_all", lambda: None)
+    monkeypatch.setattr(app_module, "get_sbert_model", lambda: release.wait(5))
+    monkeypatch.setattr(app_module, "run_warmup_queries", lambda: None)
+    return release
+
+def test_ready_after_background_warmup(client, warmup_steps):
+    assert client.get("/ready").status_code == 503
+
+    thread = app_module.start_warmup()
+    assert client.get("/health").status_code == 200  # live while warming up
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["components"]["warmup_queries"]["state"] in ("pending", "loading")
+
+    warmup_steps.set()
+    thread.join(5)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    components = response.get_json()["components"]
+    assert all(components[name]["state"] == "ready" for name in ("indexes", "sbert_model", "warmup_queries"))
+
+def test_not_ready_when_a_step_fails(client, warmup_steps, monkeypatch):
+    def broken():
+        raise RuntimeError("no model")
+    monkeypatch.setattr(app_module, "get_sbert_model", broken)
+    app_module.warm_up(include_evaluation=False)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["components"]["sbert_model"]["error"] == "no model"
@@ -0,0 +1,28 @@
+"""
+The committed artifacts must load in the memory-mapped layout: any fallback
+gives every gunicorn worker its own private copy of the index.
+"""
+
+import numpy as np
+
+from query_engine import CORPUS, IndexRegistry
+
+def memory_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+def test_shipped_index_loads_without_private_copies(capsys):
+    index = IndexRegistry().get(CORPUS)
+    out = capsys.readouterr().out
+    assert "[WARN]" not in out, out
+
+    for array in (index.tfidf_matrix.data, index.tfidf_matrix.indices, index.tfidf_postings.doc_ids,
+                  index.positional.post_docs, index.embeddings):
+        assert memory_mapped(array)
+
+    assert index.embeddings.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(index.embeddings, axis=1), 1.0, atol=1e-3)
+    assert index.tfidf_matrix.shape[0] == len(index.embeddings) == len(index.metadata)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from caching import EmbeddingCache
+
+class RecordingModel:
+    """Encodes a text as (length, uppercase count) so casing is visible"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[len(t), sum(c.isupper() for c in t)] for t in texts], dtype=np.float32)
+
+def test_embedding_cache_encodes_original_text():
+    cache, model = EmbeddingCache(maxsize=8), RecordingModel()
+    vectors = cache.encode_many(model, "m", ["Nasi  Goreng", "nasi goreng", "Soto"])
+
+    # One model call, one entry per normalized key, original casing encoded
+    assert model.calls == [["Nasi  Goreng", "Soto"]]
+    assert vectors[0].tolist() == [12, 2] and vectors[1] is vectors[0]
+    assert len(cache) == 2
+
+    # Another spelling of a cached query is a hit
+    assert cache.encode(model, "m", "NASI goreng") is vectors[0]
+    assert len(model.calls) == 1
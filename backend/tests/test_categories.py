@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import query_engine
+from query_engine import (CATEGORY_BITS, CORPUS, DOC_CATEGORIES, IndexRegistry, category_bits, get_index,
+                          resolve_categories)
+
+def test_category_bits_from_either_field():
+    docs = [
+        {"kategori": "makanan"},
+        {"Kategori": "Minuman"},
+        {"kategori": "resep_sehat"},
+        {"Kategori": "berita"},
+        {"kategori": ""},
+        {"Kategori": "gorengan"},
+        {},
+    ]
+    assert category_bits(docs).tolist() == [1, 2, 4, 8, 0, 0, 0]
+
+def test_resolve_categories():
+    assert resolve_categories(None) is None
+    assert resolve_categories(CORPUS) is None
+    assert resolve_categories(",".join(DOC_CATEGORIES)) is None
+    assert resolve_categories(" Minuman , makanan") == ("makanan", "minuman")
+    assert resolve_categories(["sehat"]) == ("sehat",)
+    with pytest.raises(ValueError):
+        resolve_categories("pizza")
+
+@pytest.fixture(scope="module")
+def index():
+    return get_index(CORPUS)
+
+def test_masks_match_document_categories(index):
+    categories = [query_engine.document_category(index.metadata[i]) for i in range(len(index))]
+    assert index.category_mask(CORPUS) is None
+    for name in DOC_CATEGORIES:
+        mask = index.category_mask(name)
+        assert mask.tolist() == [c == name for c in categories]
+        assert mask.any()
+    combined = index.category_mask("makanan,minuman")
+    np.testing.assert_array_equal(combined, index.category_mask("makanan") | index.category_mask("minuman"))
+    assert index.category_mask("minuman,makanan") is combined  # cached per resolved filter
+
+def test_filtered_search_stays_in_category(index):
+    for name in DOC_CATEGORIES:
+        hits = query_engine.search_tfidf("resep ayam sayur kopi berita", name, top_k=30)
+        assert hits["indices"]
+        assert all(index.category_bits[i] == CATEGORY_BITS[name] for i in hits["indices"])
+
+def test_load_rejects_corpus_without_categories(monkeypatch):
+    monkeypatch.setattr(query_engine, "category_bits", lambda metadata: np.zeros(len(metadata), dtype=np.uint8))
+    with pytest.raises(ValueError, match="known category"):
+        IndexRegistry().get(CORPUS)
+
+def test_load_warns_about_uncategorized_documents(monkeypatch, capsys):
+    real = query_engine.category_bits
+
+    def some_missing(metadata):
+        bits = real(metadata).copy()
+        bits[:3] = 0
+        return bits
+
+    monkeypatch.setattr(query_engine, "category_bits", some_missing)
+    index = IndexRegistry().get(CORPUS)
+    assert "[WARN] 3 of" in capsys.readouterr().out
+    assert index.category_mask(CORPUS) is None and not index.category_mask("makanan")[:3].any()
@@ -0,0 +1,53 @@
+import concurrent.futures
+import time
+
+import numpy as np
+
+import evaluate
+from evaluate import compute_metrics, query_metrics
+
+DEFAULT_SWEEP = 50  # app.EVAL_PARAMS["sample_size"]
+
+def sweep_jobs(n, n_docs=200, top_k=20, seed=0):
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for _ in range(n):
+        relevant = rng.choice(n_docs, rng.integers(0, 30), replace=False).tolist()
+        ranked = rng.choice(n_docs, top_k, replace=False).tolist()
+        jobs.append((relevant, ranked))
+    return jobs
+
+def test_query_metrics():
+    m = query_metrics(([1, 2, 3], [1, 9, 2, 8]))
+    assert m["precision"] == 0.5
+    assert m["recall"] == 2 / 3
+    assert m["f1"] == 2 * 0.5 * (2 / 3) / (0.5 + 2 / 3)
+    assert m["map"] == (1 / 1 + 2 / 3) / 2
+    assert query_metrics(([], [1, 2])) == {"precision": 0.0, "recall": 0.0, "f1": 0.0, "map": 0.0}
+
+def test_default_sweep_stays_in_process(monkeypatch):
+    # 50 queries x 2 methods: metrics take about a millisecond, a pool would take seconds
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", None)  # would fail if used
+    jobs = sweep_jobs(2 * DEFAULT_SWEEP)
+    started = time.perf_counter()
+    assert compute_metrics(jobs, workers=4) == [query_metrics(job) for job in jobs]
+    assert time.perf_counter() - started < 0.5
+
+def test_process_pool_matches_serial(monkeypatch):
+    pools = []
+    real_pool = concurrent.futures.ProcessPoolExecutor
+
+    def recording_pool(*args, **kwargs):
+        pools.append(kwargs)
+        return real_pool(*args, **kwargs)
+
+    # Pretend the metrics are expensive: pool for everything after the probe
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", recording_pool)
+    monkeypatch.setattr(evaluate, "EVAL_POOL_PROBE", 8)
+    monkeypatch.setattr(evaluate, "EVAL_POOL_MIN_SECONDS", 0.0)
+    jobs = sweep_jobs(DEFAULT_SWEEP)
+
+    parallel = compute_metrics(jobs, workers=2)
+    assert len(pools) == 1
+    assert parallel == compute_metrics(jobs, workers=1)
+    assert len(pools) == 1  # workers=1 stays in-process
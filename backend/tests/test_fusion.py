@@ -0,0 +1,127 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import query_engine
+from caching import ResultCache
+from query_engine import CORPUS, fuse_results, get_index, search_tfidf
+
+class CountingMetadata:
+    """Metadata store wrapper that records which rows are read"""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.reads = []
+
+    def __getitem__(self, i):
+        self.reads.append(int(i))
+        return self.metadata[i]
+
+    def __len__(self):
+        return len(self.metadata)
+
+@pytest.fixture(scope="module")
+def index():
+    return get_index(CORPUS)
+
+def branch_hits(ids, scores):
+    return {"indices": [int(i) for i in ids], "scores": [float(x) for x in scores]}
+
+def test_metadata_read_for_final_top_k_only(index):
+    tfidf = search_tfidf("ayam goreng", CORPUS, top_k=30)
+    rng = np.random.default_rng(0)
+    sbert = branch_hits(rng.choice(len(index.metadata), 30, replace=False), np.linspace(0.9, 0.3, 30))
+    assert "metadata" not in tfidf and len(tfidf["indices"]) == 30
+
+    counting = CountingMetadata(index.metadata)
+    view = SimpleNamespace(positional=index.positional, cooking_masks=index.cooking_masks, metadata=counting)
+    result = fuse_results("ayam goreng", CORPUS, tfidf, sbert, top_k=5, index=view)
+
+    assert result["total_results"] == 5
+    assert counting.reads == [doc["index"] for doc in result["results"]]
+    for doc in result["results"]:
+        assert doc["Judul"] == index.metadata[doc["index"]]["Judul"]
+    scores = [doc["combined_score"] for doc in result["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+def test_fusion_combines_branch_scores(index):
+    # "ayam goreng" is a title phrase of doc a; doc b only shares some words
+    a = next(i for i in range(len(index.metadata)) if "ayam goreng" in index.metadata[i]["Judul"].lower())
+    relevance = query_engine.relevance_scores("ayam goreng", np.arange(len(index.metadata)), index.positional)
+    b = int(np.flatnonzero(relevance < 0.1)[0])
+
+    tfidf = branch_hits([a, b], [0.6, 0.5])
+    sbert = branch_hits([b, a], [0.9, 0.8])
+    result = fuse_results("ayam goreng", CORPUS, tfidf, sbert, top_k=10, index=index)
+
+    assert [doc["index"] for doc in result["results"]] == [a]  # b rejected on relevance
+    doc = result["results"][0]
+    assert (doc["tfidf_score"], doc["sbert_score"], doc["relevance_score"]) == (0.6, 0.8, 1.0)
+    expected = (query_engine.TFIDF_WEIGHT * 0.6 + query_engine.SBERT_WEIGHT * 0.8) * 2.0
+    assert doc["combined_score"] == pytest.approx(expected)
+
+# ============================================================
+# CONCURRENT BRANCHES
+# ============================================================
+def sleeping_branch(seconds, ids):
+    def branch(query, category, top_k=20):
+        time.sleep(seconds)
+        return branch_hits(ids, [0.5] * len(ids))
+    return branch
+
+@pytest.fixture
+def branches(monkeypatch):
+    monkeypatch.setattr(query_engine, "SEARCH_CONCURRENT", True)
+    monkeypatch.setattr(query_engine, "BRANCH_TIMEOUT_FALLBACK", True)
+    monkeypatch.setattr(query_engine, "TFIDF_TIMEOUT_S", 5.0)
+    monkeypatch.setattr(query_engine, "SBERT_TIMEOUT_S", 5.0)
+
+    def use(tfidf_s, sbert_s):
+        monkeypatch.setattr(query_engine, "search_tfidf", sleeping_branch(tfidf_s, [1]))
+        monkeypatch.setattr(query_engine, "search_sbert", sleeping_branch(sbert_s, [2]))
+    return use
+
+def timed_branches():
+    started = time.perf_counter()
+    tfidf, sbert = query_engine.run_branches("ayam", CORPUS)
+    return tfidf, sbert, time.perf_counter() - started
+
+def test_branches_run_concurrently(branches):
+    branches(0.3, 0.3)
+    tfidf, sbert, elapsed = timed_branches()
+    assert tfidf["indices"] == [1] and sbert["indices"] == [2]
+    assert elapsed < 0.5
+
+def test_late_branch_is_dropped(branches, monkeypatch):
+    branches(0.0, 1.0)
+    monkeypatch.setattr(query_engine, "SBERT_TIMEOUT_S", 0.2)
+    tfidf, sbert, elapsed = timed_branches()
+    assert tfidf["indices"] == [1]
+    assert sbert == {"indices": [], "scores": [], "error": "timeout"}
+    assert elapsed < 0.6
+
+def test_no_fallback_waits_for_both(branches, monkeypatch):
+    branches(0.0, 0.4)
+    monkeypatch.setattr(query_engine, "SBERT_TIMEOUT_S", 0.1)
+    monkeypatch.setattr(query_engine, "BRANCH_TIMEOUT_FALLBACK", False)
+    _, sbert, elapsed = timed_branches()
+    assert sbert["indices"] == [2] and elapsed >= 0.4
+
+def test_sequential_mode(branches, monkeypatch):
+    branches(0.1, 0.1)
+    monkeypatch.setattr(query_engine, "SEARCH_CONCURRENT", False)
+    tfidf, sbert, elapsed = timed_branches()
+    assert tfidf["indices"] == [1] and sbert["indices"] == [2] and elapsed >= 0.2
+
+def test_degraded_response_not_cached(index, monkeypatch):
+    monkeypatch.setattr(query_engine, "RESULT_CACHE", ResultCache(maxsize=8, ttl=3600))
+    monkeypatch.setattr(query_engine, "RESULT_CACHE_ENABLED", True)
+    tfidf = search_tfidf("ayam goreng", CORPUS, top_k=30)
+    monkeypatch.setattr(query_engine, "run_branches",
+                        lambda query, category: (tfidf, {"indices": [], "scores": [], "error": "timeout"}))
+
+    result = query_engine.search("ayam goreng", CORPUS)
+    assert result["total_results"] > 0  # TF-IDF hits alone
+    assert len(query_engine.RESULT_CACHE) == 0
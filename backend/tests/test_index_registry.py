@@ -0,0 +1,83 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import query_engine
+from caching import ResultCache
+from query_engine import IndexRegistry, artifact_version
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    """A DATA_DIR with one artifact file, and a registry whose _load only records the version"""
+    (tmp_path / "tfidf").mkdir()
+    path = tmp_path / "tfidf" / "semua_model.json"
+    path.write_text("{}")
+    monkeypatch.setattr(query_engine, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(query_engine, "ARTIFACT_CHECK_S", 0.0)
+
+    loads = []
+    def fake_load(self, name):
+        loads.append(name)
+        return SimpleNamespace(name=name, version=artifact_version(name))
+    monkeypatch.setattr(IndexRegistry, "_load", fake_load)
+    return path, loads
+
+def retrain(path):
+    """Rewrite an artifact the way training does (new content, new mtime)"""
+    path.write_text('{"retrained": true}')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def test_reloads_after_artifacts_change(artifacts):
+    path, loads = artifacts
+    registry = IndexRegistry()
+    first = registry.get()
+    assert registry.get() is first and len(loads) == 1
+
+    retrain(path)
+    second = registry.get()
+    assert second is not first and second.version != first.version
+    assert registry.get() is second and len(loads) == 2
+
+def test_checks_are_throttled(artifacts, monkeypatch):
+    path, loads = artifacts
+    monkeypatch.setattr(query_engine, "ARTIFACT_CHECK_S", 3600.0)
+    registry = IndexRegistry()
+    first = registry.get()
+    retrain(path)
+    assert registry.get() is first and len(loads) == 1
+
+def test_failed_reload_keeps_serving(artifacts, monkeypatch):
+    path, loads = artifacts
+    registry = IndexRegistry()
+    first = registry.get()
+
+    def broken_load(self, name):
+        raise OSError("half-written artifact")
+    monkeypatch.setattr(IndexRegistry, "_load", broken_load)
+    retrain(path)
+    assert registry.get() is first
+
+def test_result_cache_invalidated_after_retrain(artifacts, monkeypatch):
+    path, _ = artifacts
+    registry = IndexRegistry()
+    computed = []
+
+    def fuse(query, category, tfidf_results, sbert_results, top_k=10, index=None):
+        computed.append(index.version)
+        return {"query": query, "category": category, "total_results": 0, "results": []}
+
+    monkeypatch.setattr(query_engine, "INDEX_REGISTRY", registry)
+    monkeypatch.setattr(query_engine, "RESULT_CACHE", ResultCache(maxsize=8, ttl=3600))
+    monkeypatch.setattr(query_engine, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(query_engine, "run_branches", lambda query, category: ({}, {}))
+    monkeypatch.setattr(query_engine, "fuse_results", fuse)
+
+    query_engine.search("ayam goreng", "semua")
+    query_engine.search("ayam goreng", "semua")
+    assert len(computed) == 1  # second call served from the cache
+
+    retrain(path)
+    query_engine.search("ayam goreng", "semua")
+    assert len(computed) == 2 and computed[0] != computed[1]
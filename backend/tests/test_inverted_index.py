@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from inverted_index import PositionalIndex, tokenize
+from query_engine import relevance_scores
+
+DOCS = [
+    {"Judul": "Ayam Goreng Kremes", "Isi Resep": "ayam, bawang putih, kunyit"},
+    {"Judul": "Sup Jagung", "Isi Resep": "jagung manis. Tambahkan ayam goreng suwir"},
+    {"Judul": "Goreng Ayamnya Dulu", "Isi Resep": "ayamnya digoreng sampai kering"},
+    {"Judul": "Tumis Kangkung", "Isi Resep": "kangkung, ayam cincang, lalu goreng bawang"},
+    {"Judul": "Es Teh", "Isi Resep": "teh, gula, es batu"},
+]
+
+@pytest.fixture(scope="module")
+def index():
+    return PositionalIndex.build_from_metadata(DOCS)
+
+def test_tokens_match_on_word_boundaries(index):
+    # Substring matching would also count "ayamnya" (doc 2)
+    assert index.term_docs("ayam").tolist() == [0, 1, 3]
+    assert index.term_docs("ayamnya").tolist() == [2]
+    assert index.term_docs("aya").tolist() == []
+    assert tokenize("Ayam, GORENG!") == ["ayam", "goreng"]
+
+def test_phrase_needs_adjacent_tokens_in_order(index):
+    assert index.docs_with_phrase(["ayam", "goreng"]).tolist() == [0, 1]
+    assert index.docs_with_phrase(["ayam", "goreng"], in_title=True).tolist() == [0]
+    # Both words but not adjacent (doc 3) or reversed (doc 2 is "goreng ayamnya")
+    assert index.docs_with_all(["ayam", "goreng"]).tolist() == [0, 1, 3]
+    assert index.docs_with_phrase(["goreng", "ayam"]).tolist() == []
+    assert index.docs_with_phrase(["tidak", "ada"]).tolist() == []
+
+def test_relevance_tiers(index):
+    relevance = relevance_scores("ayam goreng", np.arange(len(DOCS)), index)
+    # title phrase, content phrase, neither word ("ayamnya" != "ayam"), all words, no words
+    assert relevance.tolist() == [1.0, 0.9, 0.05, 0.7, 0.0]
+
+def test_matches_token_scan_on_random_texts(tmp_path):
+    rng = np.random.default_rng(1)
+    vocab = ["nasi", "ayam", "goreng", "sambal", "ikan", "bakar", "es", "teh"]
+    texts = [" ".join(rng.choice(vocab, rng.integers(1, 12))) for _ in range(200)]
+    prefix = str(tmp_path / "random_positional")
+    PositionalIndex.build(texts).save(prefix)
+    index = PositionalIndex.load(prefix)
+
+    for _ in range(100):
+        phrase = rng.choice(vocab, rng.integers(1, 4)).tolist()
+        expected = [d for d, text in enumerate(texts)
+                    if any(text.split()[i:i + len(phrase)] == phrase for i in range(len(text.split())))]
+        assert index.docs_with_phrase(phrase).tolist() == expected
+        expected_all = [d for d, text in enumerate(texts) if set(phrase) <= set(text.split())]
+        assert index.docs_with_all(phrase).tolist() == expected_all
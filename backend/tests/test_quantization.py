@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from quantization import QuantizedEmbeddings
+from scoring import l2_normalize_rows, top_k_indices
+
+N_DOCS, DIM, TOP_K = 3000, 64, 10
+
+@pytest.fixture(scope="module")
+def embeddings():
+    rng = np.random.default_rng(5)
+    return l2_normalize_rows(rng.standard_normal((N_DOCS, DIM)))
+
+@pytest.fixture(scope="module")
+def queries(embeddings):
+    rng = np.random.default_rng(6)
+    return l2_normalize_rows(embeddings[rng.choice(N_DOCS, 30)] + 0.3 * rng.standard_normal((30, DIM)))
+
+@pytest.mark.parametrize("mode, atol", [("int8", 0.02), ("float16", 1e-3)])
+def test_approx_scores_close_to_float32(embeddings, queries, mode, atol):
+    quantized = QuantizedEmbeddings.quantize(embeddings, mode)
+    for q in queries[:5]:
+        np.testing.assert_allclose(quantized.approx_scores(q), embeddings @ q, atol=atol)
+    # approx_scores folds offset/scale into the query; same as scoring dequantized vectors
+    np.testing.assert_allclose(quantized.approx_scores(queries[0]), quantized.dequantize() @ queries[0], atol=1e-4)
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+def test_rescored_results_are_exact_float32(embeddings, queries, mode, tmp_path):
+    prefix = str(tmp_path / f"embeddings_{mode}")
+    QuantizedEmbeddings.quantize(embeddings, mode).save(prefix)
+    quantized = QuantizedEmbeddings.load(prefix)
+    memmapped = np.lib.format.open_memmap(str(tmp_path / "embeddings.npy"), mode="w+", dtype=np.float32,
+                                          shape=embeddings.shape)
+    memmapped[:] = embeddings
+
+    for q in queries:
+        ids, scores = quantized.search(q, memmapped, TOP_K)
+        exact = embeddings @ q
+        # Returned scores are float32 rescores, not the quantized approximations
+        np.testing.assert_array_equal(scores, exact[ids])
+        # Shortlist of max(4 * top_k, 100) recovers the exact top_k
+        assert ids.tolist() == top_k_indices(exact, TOP_K).tolist()
+
+def test_mask_and_min_score(embeddings, queries):
+    quantized = QuantizedEmbeddings.quantize(embeddings, "int8")
+    mask = np.zeros(N_DOCS, dtype=bool)
+    mask[::7] = True
+    for q in queries:
+        exact = embeddings @ q
+        ids, scores = quantized.search(q, embeddings, TOP_K, min_score=0.1, mask=mask)
+        assert mask[ids].all() and (scores >= 0.1).all()
+        assert ids.tolist() == top_k_indices(exact, TOP_K, min_score=0.1, mask=mask).tolist()
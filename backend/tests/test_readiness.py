@@ -0,0 +1,40 @@
+from readiness import FAILED, PENDING, READY, Readiness
+
+def test_ready_only_when_required_components_are():
+    readiness = Readiness()
+    readiness.register("indexes")
+    readiness.register("evaluation", required=False)
+    assert not readiness.is_ready()
+
+    assert readiness.run("indexes", lambda: "loaded") == "loaded"
+    snapshot = readiness.snapshot()
+    assert snapshot["ready"]
+    assert snapshot["components"]["indexes"]["state"] == READY
+    assert snapshot["components"]["indexes"]["load_time_s"] >= 0
+    assert snapshot["components"]["evaluation"]["state"] == PENDING  # optional, not waited for
+
+def test_failed_step_is_recorded_and_can_recover():
+    readiness = Readiness()
+
+    def broken():
+        raise RuntimeError("model download failed")
+
+    assert readiness.run("sbert_model", broken) is None
+    component = readiness.snapshot()["components"]["sbert_model"]
+    assert component["state"] == FAILED and "download" in component["error"]
+    assert not readiness.is_ready()
+
+    readiness.run("sbert_model", lambda: object())
+    component = readiness.snapshot()["components"]["sbert_model"]
+    assert component["state"] == READY and component["error"] is None
+    assert readiness.is_ready()
+
+def test_optional_failure_does_not_block():
+    readiness = Readiness()
+    readiness.run("indexes", lambda: None)
+    readiness.run("evaluation", lambda: 1 / 0, required=False)
+    assert readiness.is_ready()
+    assert readiness.snapshot()["components"]["evaluation"]["state"] == FAILED
+
+def test_nothing_registered_is_not_ready():
+    assert not Readiness().is_ready()
@@ -0,0 +1,87 @@
+"""
+ONNX backend parity with sentence-transformers: per-text embedding cosine
+and top-k ranking overlap over corpus documents, fp32 and int8.
+Skipped when onnxruntime / tokenizers are not installed, or when the SBERT
+model is neither cached nor downloadable.
+"""
+
+import importlib.util
+
+import numpy as np
+import pytest
+
+from sbert_backend import (
+    PARITY_MIN_COSINE,
+    PARITY_MIN_TOPK_OVERLAP,
+    PARITY_TEXTS,
+    OnnxEncoder,
+    export_onnx,
+    load_encoder,
+    topk_overlap,
+)
+
+requires_onnx = pytest.mark.skipif(
+    any(importlib.util.find_spec(m) is None for m in ("onnxruntime", "tokenizers", "sentence_transformers")),
+    reason="ONNX parity needs onnxruntime, tokenizers and sentence-transformers",
+)
+
+N_DOCS = 300
+
+def unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float64)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture(scope="module")
+def torch_model():
+    from query_engine import SBERT_MODEL_NAME
+    try:
+        return load_encoder(SBERT_MODEL_NAME, "torch")
+    except Exception as e:  # offline without a cached model
+        pytest.skip(f"SBERT model unavailable: {e}")
+
+@pytest.fixture(scope="module")
+def onnx_dir(torch_model, tmp_path_factory):
+    from query_engine import SBERT_MODEL_NAME
+    return export_onnx(SBERT_MODEL_NAME, quantize=True, model_dir=str(tmp_path_factory.mktemp("onnx")))
+
+@pytest.fixture(scope="module")
+def doc_vectors(torch_model):
+    from query_engine import CORPUS, open_metadata
+    metadata = open_metadata(CORPUS)
+    docs = [f"{metadata[i].get('Judul', '')}. {metadata[i].get('Deskripsi', '')}" for i in range(min(N_DOCS, len(metadata)))]
+    return torch_model.encode(docs, convert_to_numpy=True)
+
+def precision(quantized):
+    return "int8" if quantized else "fp32"
+
+@requires_onnx
+@pytest.mark.parametrize("quantized", [False, True])
+def test_embedding_cosine(torch_model, onnx_dir, quantized):
+    encoder = OnnxEncoder(onnx_dir, quantized=quantized)
+    expected = unit(torch_model.encode(PARITY_TEXTS, convert_to_numpy=True))
+    actual = unit(encoder.encode(PARITY_TEXTS))
+    cosines = (expected * actual).sum(axis=1)
+    assert cosines.min() >= PARITY_MIN_COSINE[precision(quantized)]
+
+@requires_onnx
+@pytest.mark.parametrize("quantized", [False, True])
+def test_topk_overlap(torch_model, onnx_dir, doc_vectors, quantized):
+    encoder = OnnxEncoder(onnx_dir, quantized=quantized)
+    overlap = topk_overlap(
+        torch_model.encode(PARITY_TEXTS, convert_to_numpy=True), encoder.encode(PARITY_TEXTS), doc_vectors
+    )
+    assert overlap >= PARITY_MIN_TOPK_OVERLAP[precision(quantized)]
+
+@requires_onnx
+def test_padded_batch_matches_single(onnx_dir):
+    encoder = OnnxEncoder(onnx_dir)
+    batch = unit(encoder.encode(PARITY_TEXTS))
+    single = unit(np.vstack([encoder.encode([text]) for text in PARITY_TEXTS]))
+    assert (batch * single).sum(axis=1).min() >= PARITY_MIN_COSINE["fp32"]
+
+def test_topk_overlap_measure():
+    rng = np.random.default_rng(0)
+    docs = rng.standard_normal((50, 8))
+    queries = rng.standard_normal((5, 8))
+    assert topk_overlap(queries, queries, docs, k=10) == 1.0
+    assert topk_overlap(queries, -queries, docs, k=10) == 0.0
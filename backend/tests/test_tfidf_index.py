@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix, hstack, random as sparse_random
+
+from scoring import sparse_scores, top_k_indices
+from tfidf_index import TfidfPostings
+
+N_DOCS, N_TERMS = 400, 120
+
+def normalized(matrix):
+    matrix = matrix.tocsr()
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1.0
+    return csr_matrix(matrix.multiply(1.0 / norms[:, None]))
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(7)
+    # Skewed term frequencies: a few common terms, a long rare tail
+    density = np.clip(0.3 / np.arange(1, N_TERMS + 1) ** 0.7, 0.003, None)
+    columns = [sparse_random(N_DOCS, 1, density=d, random_state=rng, format="csc") for d in density]
+    return normalized(hstack(columns))
+
+def exhaustive(matrix, query, top_k, min_score, mask):
+    scores = sparse_scores(query, matrix)[0]
+    # MaxScore only returns documents that share a term with the query
+    keep = scores > 0 if mask is None else (scores > 0) & mask
+    top = top_k_indices(scores, top_k, min_score=min_score, mask=keep)
+    return top, scores[top]
+
+def random_query(rng):
+    n_terms = rng.integers(1, 7)
+    terms = rng.choice(N_TERMS, n_terms, replace=False)
+    row = csr_matrix((rng.random(n_terms) + 0.05, (np.zeros(n_terms, dtype=int), terms)), shape=(1, N_TERMS))
+    return normalized(row)
+
+@pytest.mark.parametrize("selectivity", [None, 0.5, 0.1, 0.02])
+@pytest.mark.parametrize("min_score", [None, 0.05])
+def test_maxscore_matches_exhaustive(corpus, selectivity, min_score):
+    rng = np.random.default_rng(0 if selectivity is None else int(selectivity * 1000))
+    postings = TfidfPostings.build(corpus)
+    for _ in range(150):
+        mask = None if selectivity is None else rng.random(N_DOCS) < selectivity
+        query = random_query(rng)
+        top_k = int(rng.integers(1, 40))
+
+        ids, scores = postings.search(query, top_k, min_score=min_score, mask=mask)
+        expected_ids, expected_scores = exhaustive(corpus, query, top_k, min_score, mask)
+
+        np.testing.assert_allclose(scores, expected_scores, rtol=0, atol=1e-5)
+        if mask is not None:
+            assert mask[ids].all()
+        # Ids may only differ among tied scores: check each id carries its exact score
+        exact = sparse_scores(query, corpus)[0]
+        np.testing.assert_allclose(exact[ids], scores, rtol=0, atol=1e-5)
+
+def test_masked_out_essential_terms():
+    # Term 0 dominates the upper bound but all its documents are masked out;
+    # term 1 then runs as a non-essential term over an empty candidate set
+    matrix = csr_matrix(np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]]))
+    postings = TfidfPostings.build(matrix)
+    query = csr_matrix(np.array([[0.99, 0.14]]))
+    mask = np.array([False, False, True])
+
+    ids, scores = postings.search(query, 1, min_score=0.5, mask=mask)
+    assert len(ids) == 0 and scores.dtype == np.float64
+    ids, scores = postings.search(query, 5, mask=mask)
+    assert ids.tolist() == [2]
+    np.testing.assert_allclose(scores, [0.14])
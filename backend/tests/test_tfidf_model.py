@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from tfidf_model import TfidfModel
+from train_tfidf import simple_tokenizer
+
+CORPUS = [
+    "nasi goreng ayam kecap pedas",
+    "ayam goreng bumbu kuning",
+    "soto ayam kuah bening",
+    "es jeruk segar gula aren",
+    "kopi susu gula aren",
+    "sayur bening bayam jagung",
+    "rendang daging sapi santan santan",
+    "harga cabai naik pasar",
+    "kue crème brûlée tanpa oven",
+    "jus alpukat café susu coklat",
+]
+
+QUERIES = [
+    "ayam goreng",
+    "goreng ayam ayam",
+    "gula aren kopi susu",
+    "crème brûlée",
+    "santan",
+    "pizza burger",            # all out of vocabulary
+    "ayam pizza",              # partly out of vocabulary
+    "",
+    "   ",
+]
+
+def fit(**params):
+    # Same setup as train_tfidf.py, max_features small enough to drop terms
+    options = dict(tokenizer=simple_tokenizer, token_pattern=None, preprocessor=None, lowercase=False,
+                   max_features=40, ngram_range=(1, 2))
+    options.update(params)
+    return TfidfVectorizer(**options).fit(CORPUS)
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"sublinear_tf": True},
+    {"binary": True, "norm": "l1"},
+    {"norm": None, "ngram_range": (1, 1)},
+])
+def test_transform_matches_sklearn(params):
+    vectorizer = fit(**params)
+    model = TfidfModel.from_vectorizer(vectorizer)
+    texts = CORPUS + QUERIES
+
+    expected = vectorizer.transform(texts).toarray()
+    actual = model.transform(texts).toarray()
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+
+def test_save_load_roundtrip(tmp_path):
+    vectorizer = fit()
+    prefix = str(tmp_path / "semua")
+    TfidfModel.from_vectorizer(vectorizer).save(prefix)
+    model = TfidfModel.load(prefix)
+
+    np.testing.assert_allclose(model.transform(QUERIES).toarray(), vectorizer.transform(QUERIES).toarray(),
+                               rtol=0, atol=1e-12)
+
+def test_rejects_other_tokenizers():
+    with pytest.raises(ValueError):
+        TfidfModel.from_vectorizer(TfidfVectorizer(lowercase=False).fit(CORPUS))
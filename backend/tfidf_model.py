@@ -0,0 +1,194 @@
+"""
+Compact, pickle-free TF-IDF model untuk query-time transform.
+
+Isi model (ditulis train_tfidf sebagai tfidf/{index}_model.*):
+  - vocab : tabel string terurut (UTF-8 bytes, fixed width); indeks fitur
+            = posisi di tabel, sama seperti urutan vocabulary_ sklearn
+  - idf   : float64 array per fitur
+  - config: JSON analyzer config + format version
+
+TfidfModel.transform() mereproduksi TfidfVectorizer.transform() untuk
+analyzer yang dipakai train_tfidf (whitespace tokenizer + word n-grams),
+tanpa unpickling dan tanpa overhead sklearn. Kesetaraan dengan sklearn
+dicek saat export (check_equivalence).
+
+Konversi vectorizer .pkl yang sudah ada:  python tfidf_model.py
+"""
+
+import json
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from array_store import arrays_exist, load_arrays, save_arrays
+
+FORMAT_VERSION = 1
+EQUIVALENCE_ATOL = 1e-9
+
+class TfidfModel:
+    ARRAYS = ("vocab", "idf")
+
+    def __init__(self, vocab, idf, config):
+        if config.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported TF-IDF model format: {config.get('format_version')}")
+        self.vocab = vocab
+        self.idf = idf
+        self.config = config
+        self.ngram_range = tuple(config["ngram_range"])
+        self.lowercase = config["lowercase"]
+        self.binary = config["binary"]
+        self.sublinear_tf = config["sublinear_tf"]
+        self.norm = config["norm"]
+
+    # ---------- export from sklearn ----------
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        """Compact copy of a fitted TfidfVectorizer using a whitespace tokenizer"""
+        params = vectorizer.get_params()
+        tokenizer = params["tokenizer"]
+        if (params["analyzer"] != "word" or params["preprocessor"] is not None
+                or params["stop_words"] is not None or params["strip_accents"] is not None
+                or getattr(tokenizer, "__name__", None) != "simple_tokenizer"):
+            raise ValueError("Only whitespace-tokenized word n-gram vectorizers can be exported")
+
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        if terms != sorted(terms):
+            raise ValueError("Vectorizer vocabulary indices are not in sorted term order")
+
+        idf = vectorizer.idf_ if params["use_idf"] else np.ones(len(terms))
+        config = {
+            "format_version": FORMAT_VERSION,
+            "tokenizer": "whitespace",
+            "ngram_range": list(params["ngram_range"]),
+            "lowercase": bool(params["lowercase"]),
+            "binary": bool(params["binary"]),
+            "sublinear_tf": bool(params["sublinear_tf"]),
+            "norm": params["norm"],
+            "n_features": len(terms),
+        }
+        # UTF-8 byte order == code point order, so the table stays sorted for searchsorted
+        vocab = np.array([t.encode("utf-8") for t in terms], dtype=bytes)
+        return cls(vocab, np.asarray(idf, dtype=np.float64), config)
+
+    # ---------- persist ----------
+    def save(self, prefix):
+        save_arrays(prefix, vocab=self.vocab, idf=self.idf)
+        with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+            json.dump(self.config, f, indent=2)
+
+    @classmethod
+    def exists(cls, prefix):
+        return arrays_exist(prefix, cls.ARRAYS) and os.path.exists(f"{prefix}.json")
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        with open(f"{prefix}.json", "r", encoding="utf-8") as f:
+            config = json.load(f)
+        data = load_arrays(prefix, cls.ARRAYS, mmap=mmap)
+        return cls(data["vocab"], data["idf"], config)
+
+    def __len__(self):
+        return len(self.vocab)
+
+    # ---------- transform ----------
+    def analyze(self, text):
+        """Word n-grams exactly as sklearn's analyzer builds them for this config"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = text.split()
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def term_ids(self, grams):
+        """Feature ids of the in-vocabulary grams (binary search in the sorted table)"""
+        if not grams or len(self.vocab) == 0:
+            return np.empty(0, dtype=np.int64)
+        keys = np.array([g.encode("utf-8") for g in grams], dtype=bytes)
+        pos = np.searchsorted(self.vocab, keys)
+        pos_clipped = np.minimum(pos, len(self.vocab) - 1)
+        found = self.vocab[pos_clipped] == keys
+        return pos_clipped[found].astype(np.int64)
+
+    def transform(self, texts):
+        """n_texts x n_features CSR matrix, same values as TfidfVectorizer.transform"""
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            ids, counts = np.unique(self.term_ids(self.analyze(text)), return_counts=True)
+            tf = counts.astype(np.float64)
+            if self.binary:
+                tf[:] = 1.0
+            elif self.sublinear_tf:
+                tf = np.log(tf) + 1.0
+            values = tf * self.idf[ids]
+
+            if self.norm == "l2":
+                norm = np.sqrt(np.sum(values * values))
+            elif self.norm == "l1":
+                norm = np.sum(np.abs(values))
+            else:
+                norm = 0.0
+            if norm > 0:
+                values = values / norm
+
+            indices.append(ids)
+            data.append(values)
+            indptr.append(indptr[-1] + len(ids))
+
+        data = np.concatenate(data) if data else np.empty(0)
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        return csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(self.vocab)))
+
+# ============================================================
+# EQUIVALENCE CHECK VS SKLEARN
+# ============================================================
+def check_equivalence(model, vectorizer, texts, atol=EQUIVALENCE_ATOL):
+    """
+    Max absolute difference between model.transform and vectorizer.transform.
+    Raises ValueError if any entry differs by more than atol.
+    """
+    texts = list(texts)
+    expected = vectorizer.transform(texts).tocsr()
+    actual = model.transform(texts)
+    diff = abs(expected - actual).max() if len(texts) else 0.0
+    if diff > atol:
+        raise ValueError(f"TF-IDF model differs from sklearn by {diff:.3g} (> {atol:g})")
+    return float(diff)
+
+def equivalence_texts(docs, extra=()):
+    """Corpus documents plus short query-like slices of them"""
+    texts = list(docs) + list(extra)
+    for doc in docs:
+        tokens = doc.split()
+        texts.extend(" ".join(tokens[i:i + 3]) for i in range(0, min(len(tokens), 30), 7))
+    return texts
+
+# ============================================================
+# CONVERT EXISTING PICKLED VECTORIZERS
+# ============================================================
+if __name__ == "__main__":
+    import glob
+    from query_engine import BASE_DIR, load_vectorizer
+
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "tfidf", "*_vectorizer.pkl"))):
+        name = os.path.basename(path)[:-len("_vectorizer.pkl")]
+        vectorizer = load_vectorizer(name)
+        model = TfidfModel.from_vectorizer(vectorizer)
+
+        tokens_path = os.path.join(BASE_DIR, "tokens", f"{name}_tokens.json")
+        docs = []
+        if os.path.exists(tokens_path):
+            with open(tokens_path, "r", encoding="utf-8") as f:
+                docs = [item["tokens_joined"] for item in json.load(f) if item.get("tokens_joined")]
+        diff = check_equivalence(model, vectorizer, equivalence_texts(docs, ["", "zzz tidak ada"]))
+
+        model.save(os.path.join(BASE_DIR, "tfidf", f"{name}_model"))
+        print(f"✓ {name}: {len(model)} features, max diff vs sklearn {diff:.2e} -> tfidf/{name}_model.*")
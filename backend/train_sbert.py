@@ -1,13 +1,31 @@
 import json
 import numpy as np
 import os
-from sentence_transformers import SentenceTransformer
-
-CATEGORIES = ["makanan", "minuman", "sehat", "berita", "semua"]
-
-# Load pre-trained multilingual SBERT model
-# Model ini lebih baik untuk Indonesian text
-model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+import sys
+from array_store import array_path
+from ann_index import ANN_MIN_DOCS, IVFFlatIndex, recall_report
+from quantization import QUANT_MODES, QuantizedEmbeddings
+from query_engine import SBERT_BACKEND, SBERT_INT8, SBERT_MODEL_NAME
+from sbert_backend import load_encoder
+from scoring import l2_normalize_rows
+
+# Quantized copies to write next to the float32 embeddings ("int8,float16" / "" = none)
+QUANTIZE = [m for m in os.environ.get("TASTEFIND_QUANTIZE", "int8").split(",") if m]
+
+# Satu index untuk seluruh korpus; kategori dipilih saat query lewat
+# bitmap per dokumen (field kategori/Kategori) di query_engine
+INDEXES = ["semua"]
+
+# Pre-trained multilingual SBERT model (lebih baik untuk Indonesian text),
+# dimuat saat dipakai lewat backend yang sama dengan query_engine
+# (TASTEFIND_SBERT_BACKEND; "stub" untuk scaling test offline)
+model = None
+
+def get_model():
+    global model
+    if model is None:
+        model = load_encoder(SBERT_MODEL_NAME, SBERT_BACKEND, SBERT_INT8)
+    return model
 
 def load_original_text(cat):
     """
@@ -116,7 +134,7 @@ def train_sbert():
     # Create output directory jika belum ada
     os.makedirs("embeddings", exist_ok=True)
     
-    for cat in CATEGORIES:
+    for cat in INDEXES:
         print(f"\n{'='*60}")
         print(f"Generating SBERT embeddings for {cat}")
         print(f"{'='*60}")
@@ -126,16 +144,68 @@ def train_sbert():
         print(f"Processing embeddings (this may take a while)...")
         
         # Generate embeddings dari original text (natural language)
-        embeddings = model.encode(docs, show_progress_bar=True, convert_to_numpy=True)
+        # Disimpan L2-normalized float32 -> cosine similarity = dot product saat query
+        embeddings = l2_normalize_rows(get_model().encode(
+            docs,
+            show_progress_bar=True,
+            convert_to_numpy=True
+        ))
         print(f"Embeddings shape: {embeddings.shape}")
+        save_embeddings(cat, embeddings)
 
-        # Simpan embeddings
-        np.save(f"embeddings/{cat}_embeddings.npy", embeddings)
+def save_embeddings(cat, embeddings):
+    """Unit-length float32 embeddings (memory-mapped by query_engine) + ANN index + quantized copies"""
+    np.save(f"embeddings/{cat}_embeddings.npy", embeddings)
 
-        print(f"✓ Saved SBERT embeddings for {cat}")
-        print(f"  - Embeddings: embeddings/{cat}_embeddings.npy")
+    print(f"✓ Saved SBERT embeddings for {cat}")
+    print(f"  - Embeddings: embeddings/{cat}_embeddings.npy")
+
+    build_ann_index(cat, embeddings)
+    save_quantized(cat, embeddings)
+
+def convert_embeddings(cat):
+    """
+    Normalize an older embeddings/{cat}_embeddings.npy in place (unit-length
+    float32, so workers can share the mmap) without re-encoding the corpus.
+    """
+    embeddings = l2_normalize_rows(np.load(f"embeddings/{cat}_embeddings.npy"))
+    save_embeddings(cat, embeddings)
+
+def save_quantized(cat, embeddings):
+    for mode in QUANTIZE:
+        if mode not in QUANT_MODES:
+            print(f"  - Unknown quantization mode '{mode}', skipped")
+            continue
+        quantized = QuantizedEmbeddings.quantize(embeddings, mode)
+        quantized.save(f"embeddings/{cat}_embeddings_{mode}")
+        print(f"  - Quantized ({mode}): embeddings/{cat}_embeddings_{mode}.*.npy "
+              f"({quantized.nbytes / 1024:.0f} KB vs {embeddings.nbytes / 1024:.0f} KB float32)")
+
+def build_ann_index(cat, embeddings):
+    """IVF-flat ANN index + recall@k report; small categories stay brute force"""
+    ann_prefix = f"embeddings/{cat}_ivf"
+    if len(embeddings) < ANN_MIN_DOCS:
+        for name in IVFFlatIndex.ARRAYS:
+            if os.path.exists(array_path(ann_prefix, name)):
+                os.remove(array_path(ann_prefix, name))
+        print(f"  - ANN index: skipped ({len(embeddings)} < {ANN_MIN_DOCS} docs, exact search)")
+        return
+
+    index = IVFFlatIndex.build(embeddings)
+    index.save(ann_prefix)
+    print(f"  - ANN index: {ann_prefix}.*.npy ({index.n_lists} lists)")
+
+    print(f"  recall@10 vs brute force:")
+    for n_probe, r in recall_report(index, embeddings, k=10).items():
+        print(f"    n_probe={n_probe:<3} recall={r['recall_at_k']:.3f} scanned={r['scanned_fraction']:.1%}")
 
 if __name__ == "__main__":
+    # python train_sbert.py --convert : only normalize existing embeddings (no model needed)
+    if "--convert" in sys.argv[1:]:
+        for cat in INDEXES:
+            convert_embeddings(cat)
+        sys.exit(0)
+
     print("Starting SBERT embeddings generation...")
     train_sbert()
     print("\n" + "="*60)
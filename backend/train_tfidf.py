@@ -1,11 +1,17 @@
 import json
-import pickle
 import numpy as np
 import os
+import sys
+from scipy.sparse import load_npz
 from sklearn.feature_extraction.text import TfidfVectorizer
-from scipy.sparse import save_npz
+from array_store import save_csr
+from inverted_index import PositionalIndex
+from tfidf_index import TfidfPostings
+from tfidf_model import TfidfModel, check_equivalence, equivalence_texts
 
-CATEGORIES = ["makanan", "minuman", "sehat", "berita", "semua"]
+# Satu index untuk seluruh korpus; kategori dipilih saat query lewat
+# bitmap per dokumen (field kategori/Kategori) di query_engine
+INDEXES = ["semua"]
 
 def simple_tokenizer(text):
     """Simple tokenizer yang bisa di-pickle"""
@@ -31,7 +37,7 @@ def train_tfidf():
     # Create output directory jika belum ada
     os.makedirs("tfidf", exist_ok=True)
     
-    for cat in CATEGORIES:
+    for cat in INDEXES:
         print(f"\n{'='*60}")
         print(f"Training TF-IDF for category: {cat}")
         print(f"{'='*60}")
@@ -47,22 +53,57 @@ def train_tfidf():
             ngram_range=(1, 2)
         )
 
-        matrix = vectorizer.fit_transform(docs)
+        # Rows are L2-normalized (norm='l2' default) -> query scoring is a dot product
+        matrix = vectorizer.fit_transform(docs).astype(np.float32)
         print(f"TF-IDF matrix shape: {matrix.shape}")
         print(f"Vocabulary size: {len(vectorizer.get_feature_names_out())}")
 
-        # Simpan vectorizer
-        with open(f"tfidf/{cat}_vectorizer.pkl", "wb") as f:
-            pickle.dump(vectorizer, f)
+        # Simpan model TF-IDF compact (vocab + IDF + analyzer config, tanpa pickle),
+        # setelah dicek transform-nya identik dengan sklearn
+        model = TfidfModel.from_vectorizer(vectorizer)
+        diff = check_equivalence(model, vectorizer, equivalence_texts(docs))
+        model.save(f"tfidf/{cat}_model")
+        print(f"Compact model matches sklearn (max diff {diff:.2e})")
 
-        # Simpan matrix TF-IDF
-        save_npz(f"tfidf/{cat}_matrix.npz", matrix)
+        save_index_arrays(cat, matrix)
 
         print(f"✓ Saved TF-IDF model for {cat}")
-        print(f"  - Vectorizer: backend/tfidf/{cat}_vectorizer.pkl")
-        print(f"  - Matrix: backend/tfidf/{cat}_matrix.npz")
+        print(f"  - Model: backend/tfidf/{cat}_model.{{json,vocab.npy,idf.npy}}")
+        print(f"  - Matrix: backend/tfidf/{cat}_csr.{{data,indices,indptr,shape}}.npy")
+        print(f"  - Postings: backend/tfidf/{cat}_postings.*.npy")
+        print(f"  - Positional index: backend/tfidf/{cat}_positional.*.npy")
+
+def save_index_arrays(cat, matrix):
+    """Raw arrays that query_engine memory-maps: CSR matrix, MaxScore postings, positional index"""
+    # Simpan matrix TF-IDF sebagai raw CSR arrays (di-mmap oleh query_engine)
+    save_csr(f"tfidf/{cat}_csr", matrix)
+
+    # Term-major postings + per-term upper bounds untuk MaxScore top-k
+    TfidfPostings.build(matrix).save(f"tfidf/{cat}_postings")
+
+    # Positional inverted index untuk phrase / all-words matching
+    with open(f"metadata/{cat}.json", "r", encoding="utf-8") as f:
+        positional = PositionalIndex.build_from_metadata(json.load(f))
+    positional.save(f"tfidf/{cat}_positional")
+    print(f"Positional index: {len(positional.terms)} terms, {len(positional.post_docs)} postings")
+
+def convert_matrix(cat):
+    """
+    Re-save an older tfidf/{cat}_matrix.npz (compressed, decompressed into every
+    worker) as the memory-mapped arrays, without refitting the vectorizer.
+    """
+    matrix = load_npz(f"tfidf/{cat}_matrix.npz").tocsr().astype(np.float32)
+    save_index_arrays(cat, matrix)
+    os.remove(f"tfidf/{cat}_matrix.npz")
+    print(f"✓ Converted tfidf/{cat}_matrix.npz ({matrix.shape[0]} docs) -> tfidf/{cat}_{{csr,postings,positional}}.*.npy")
 
 if __name__ == "__main__":
+    # python train_tfidf.py --convert : only rewrite existing *_matrix.npz in the raw array layout
+    if "--convert" in sys.argv[1:]:
+        for cat in INDEXES:
+            convert_matrix(cat)
+        sys.exit(0)
+
     print("Starting TF-IDF model training...")
     train_tfidf()
     print("\n" + "="*60)
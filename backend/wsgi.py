@@ -0,0 +1,14 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py
+
+gunicorn.conf.py sets preload_app, so this module is imported once in the
+gunicorn master: indexes and the SBERT model are loaded (and warm-up queries
+run) before the workers are forked, and every worker shares those pages.
+"""
+
+from app import EAGER_WARMUP, app as application, warm_up
+
+if EAGER_WARMUP:
+    warm_up(include_evaluation=False)
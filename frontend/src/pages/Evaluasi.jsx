@@ -47,7 +47,14 @@ export default function Evaluasi() {
           <div key={algo} className="mb-6 border-b border-white/10 pb-4">
             <h3 className="text-lg font-semibold capitalize">{algo} Similarity</h3>
             <div className="mt-2 text-sm text-white/80">
-              <p>Runtime : {metrics[algo].runtime_ms} ms</p>
+              {metrics[algo].runtime_ms !== undefined ? (
+                <p>Runtime : {metrics[algo].runtime_ms} ms</p>
+              ) : (
+                <>
+                  <p>Runtime ({report.queries} query, batch) : {metrics[algo].batch_ms} ms</p>
+                  <p>Runtime rata-rata per query (amortized) : {metrics[algo].amortized_ms} ms</p>
+                </>
+              )}
               <p>Precision : {metrics[algo].precision}</p>
               <p>Recall : {metrics[algo].recall}</p>
               <p>f-measure : {metrics[algo].f1}</p>